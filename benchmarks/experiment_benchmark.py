@@ -0,0 +1,274 @@
+"""
+Сквозной замер скорости экспериментов на имитаторах приборов.
+
+SearchOptimalLevel и Linear запускаются против source.simulators с
+фиксированным начальным значением шума. Для каждого прогона выводится
+общее время, точек в минуту и разбивка по фазам: запись в генератор,
+ожидание установления, запросы осциллографа, запись CSV, журнал, график,
+постановка экспорта (PNG, Excel) в очередь и ожидание фонового экспорта.
+Время фаз исключающее: ожидание установления не включает вложенные в него
+запросы осциллографа. Результаты дописываются
+в JSON-историю, и каждый прогон сравнивается с предыдущим таким же.
+
+Параметры поиска, установления и окна уровней берутся из config.ini.
+Паузы установления, пауза между повторными чтениями и время точки свипа
+делятся на --speed, как и динамика модели стенда. --sweep list включает в Linear list-свип генератора
+(параметры из секции [Sweep]); ожидание точек свипа попадает в other.
+--refine включает адаптивную сетку частот (секция [Refine]), points - число
+точек исходной сетки.
+
+Запуск из корня репозитория:
+    python -m benchmarks.experiment_benchmark
+    python -m benchmarks.experiment_benchmark --points 200 --experiment Linear
+    python -m benchmarks.experiment_benchmark --experiment Linear --sweep list
+"""
+import argparse
+import datetime
+import functools
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import time
+
+from source import export
+from source.funcs import Linear, SearchOptimalLevel
+from source.handlers import ConvertData, ResultSink
+from source.hardware import AKIP4122, RigolDSG815
+from source.journal import Journal
+from source.parsing import section_pars
+from source.plotting import LivePlot
+from source.settling import SettlingDetector
+from source.simulators import BenchSimulator
+
+FREQ_START = 1120
+FREQ_STOP = 1220
+CENTER_FREQ = 1160
+DB_STEP = 10
+LEVEL = -70
+
+HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history.json")
+CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config.ini")
+
+# Методы, время которых относится к фазе
+PHASES = {
+    "generator": [(RigolDSG815, "configure"), (RigolDSG815, "out_on"), (RigolDSG815, "out_off"),
+                  (RigolDSG815, "load_sweep"), (RigolDSG815, "start_sweep"), (RigolDSG815, "trigger"),
+                  (RigolDSG815, "stop_sweep")],
+    "settle": [(SettlingDetector, "wait")],
+    "oscilloscope": [(AKIP4122, "get_all"), (AKIP4122, "get_mean"), (AKIP4122, "get_pkp")],
+    "csv": [(ConvertData, "flush_to_csv"), (ConvertData, "save"), (ResultSink, "close")],
+    "journal": [(Journal, "write")],
+    "plot": [(ConvertData, "update_plot"), (LivePlot, "redraw")],
+    "export": [(ConvertData, "convert_to_png"), (ConvertData, "save_summary"), (ConvertData, "csv_to_excel")],
+    "export_wait": [(export, "wait")],
+}
+
+
+class PhaseTimer:
+    """
+    Учет исключающего времени по фазам.
+    Методы классов подменяются обертками на время прогона, время вложенного
+    вызова другой фазы вычитается из времени внешнего
+    """
+
+    def __init__(self, phases: dict):
+        self.phases = phases
+        self.time = {phase: 0.0 for phase in phases}
+        self.calls = {phase: 0 for phase in phases}
+        self.__stack = []
+        self.__originals = []
+
+    def __enter__(self):
+        for phase, methods in self.phases.items():
+            for cls, name in methods:
+                original = cls.__dict__[name]
+                self.__originals.append((cls, name, original))
+                setattr(cls, name, self.__wrap(phase, original))
+        return self
+
+    def __exit__(self, *exc_info):
+        for cls, name, original in reversed(self.__originals):
+            setattr(cls, name, original)
+        self.__originals.clear()
+
+    def __wrap(self, phase, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            # [фаза, время вложенных фаз]
+            frame = [phase, 0.0]
+            self.__stack.append(frame)
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.__stack.pop()
+                self.time[phase] += elapsed - frame[1]
+                self.calls[phase] += 1
+                if self.__stack:
+                    self.__stack[-1][1] += elapsed
+        return wrapper
+
+
+def scaled_settling(speed: float):
+    """Параметры установления из config.ini с паузами, ускоренными вместе с моделью"""
+    settling = section_pars("Settling", CONFIG)
+    for name in ("min_wait", "max_wait", "poll_interval"):
+        if name in settling:
+            settling[name] = settling[name] / speed
+    return settling
+
+
+def scaled_sweep(mode: str, speed: float):
+    """Параметры свипа из config.ini с временем точки, ускоренным вместе с моделью"""
+    sweep = dict(section_pars("Sweep", CONFIG), mode=mode)
+    for name in ("dwell", "read_delay"):
+        if name in sweep:
+            sweep[name] = sweep[name] / speed
+    return sweep
+
+
+def scaled_averaging(speed: float):
+    """Параметры повторных чтений из config.ini с паузой, ускоренной вместе с моделью"""
+    averaging = section_pars("Averaging", CONFIG)
+    if "sample_interval" in averaging:
+        averaging["sample_interval"] = averaging["sample_interval"] / speed
+    return averaging
+
+
+def make_experiment(name: str, points: int, runs: int, speed: float, sweep: str, refine: bool, osc, gen):
+    options = dict(search=section_pars("Search", CONFIG),
+                   settling=scaled_settling(speed),
+                   output=section_pars("Output", CONFIG),
+                   plot={"headless": True},
+                   window=section_pars("PowerLimiter", CONFIG),
+                   calibration={"enabled": 0},
+                   sweep=scaled_sweep(sweep, speed),
+                   refine=dict(section_pars("Refine", CONFIG), enabled=int(refine)),
+                   averaging=scaled_averaging(speed))
+    freq_step = (FREQ_STOP - FREQ_START) / points
+    if name == "SearchOptimalLevel":
+        return SearchOptimalLevel(FREQ_START, FREQ_STOP, freq_step, CENTER_FREQ, DB_STEP, osc, gen,
+                                  f"benchmark_{name}", **options)
+    return Linear(FREQ_START, FREQ_STOP, freq_step, CENTER_FREQ, LEVEL, runs, osc, gen,
+                  f"benchmark_{name}", **options)
+
+
+def run(name: str, points: int, runs: int, speed: float, seed: int, sweep: str = "point", refine: bool = False):
+    """Один прогон эксперимента в пустом временном каталоге"""
+    with BenchSimulator(speed=speed, seed=seed) as simulator:
+        gen = RigolDSG815(simulator.host, vxi11_port=simulator.generator.port)
+        osc = AKIP4122(simulator.host, simulator.oscilloscope.port)
+        experiment = make_experiment(name, points, runs, speed, sweep, refine, osc, gen)
+        with PhaseTimer(PHASES) as timer:
+            start = time.perf_counter()
+            experiment.start()
+            export.wait()
+            wall = time.perf_counter() - start
+        gen.disconnect()
+        osc.disconnect()
+
+    planned = experiment.planner.planned if experiment.planner is not None else experiment.num_elements
+    # Повторы (--runs) есть только у Linear
+    total = planned * runs if name == "Linear" else planned
+    phases = dict(timer.time, other=wall - sum(timer.time.values()))
+    return {"date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": commit(),
+            "experiment": name,
+            "points": total,
+            "speed": speed,
+            "seed": seed,
+            "sweep": sweep,
+            "refine": refine,
+            "grid": experiment.num_elements,
+            "wall": round(wall, 4),
+            "points_per_minute": round(total / wall * 60, 2),
+            "phases": {phase: round(value, 4) for phase, value in phases.items()},
+            "calls": timer.calls}
+
+
+def commit():
+    """Короткий хеш текущего коммита или None вне git"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(HISTORY), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path: str):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_history(path: str, history: list):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as file:
+        json.dump(history, file, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def previous(history: list, result: dict):
+    """Последний прогон с теми же условиями"""
+    for record in reversed(history):
+        # Прогоны без полей sweep и refine выполнены поточечно на равномерной сетке
+        if all(record.get(key, default) == result[key]
+               for key, default in (("experiment", None), ("grid", record.get("points")), ("speed", None),
+                                    ("seed", None), ("sweep", "point"), ("refine", False))):
+            return record
+    return None
+
+
+def report(result: dict, before: dict | None):
+    print(f"\n{result['experiment']}: {result['points']} точек из {result['grid']} за {result['wall']:.2f} с, "
+          f"{result['points_per_minute']:.1f} точек/мин (коммит {result['commit']})")
+    if before is not None:
+        change = (result["wall"] / before["wall"] - 1) * 100
+        print(f"Относительно {before['commit']} от {before['date']}: {change:+.1f}% по времени")
+    print(f"{'Фаза':<14}{'Время, с':>10}{'Доля':>8}{'Вызовов':>9}{'Было, с':>10}")
+    for phase, value in result["phases"].items():
+        calls = result["calls"].get(phase, "")
+        was = f"{before['phases'].get(phase, 0):.3f}" if before is not None else "-"
+        print(f"{phase:<14}{value:>10.3f}{value / result['wall']:>8.1%}{calls:>9}{was:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сквозной замер скорости экспериментов на имитаторах")
+    parser.add_argument("--experiment", nargs="+", default=["SearchOptimalLevel", "Linear"],
+                        choices=["SearchOptimalLevel", "Linear"])
+    parser.add_argument("--points", type=int, default=1000, help="точек по частоте")
+    parser.add_argument("--runs", type=int, default=1, help="повторов Linear")
+    parser.add_argument("--speed", type=float, default=50, help="ускорение модели стенда")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sweep", default="point", choices=["point", "list"], help="перестройка генератора в Linear")
+    parser.add_argument("--refine", action="store_true", help="адаптивная сетка частот")
+    parser.add_argument("--history", default=HISTORY, help="файл истории прогонов")
+    parser.add_argument("--no-save", action="store_true", help="не дописывать историю")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s - %(message)s")
+    history_path = os.path.abspath(args.history)
+    history = load_history(history_path)
+    workdir = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            for name in args.experiment:
+                result = run(name, args.points, args.runs, args.speed, args.seed, args.sweep, args.refine)
+                report(result, previous(history, result))
+                history.append(result)
+        finally:
+            os.chdir(workdir)
+
+    if not args.no_save:
+        save_history(history_path, history)
+        print(f"\nИстория сохранена в {history_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Сравнение стратегий поиска оптимального уровня с линейным проходом.
+
+Генератор и осциллограф заменены моделью напряжения детектора U(Дб, Мгц),
+поэтому скрипт считает только количество шагов генератора и оценку времени
+прогона при фиксированной задержке 0.3 с на каждый шаг.
+
+Запуск из корня репозитория:
+    python -m benchmarks.search_benchmark
+"""
+import time
+
+import numpy as np
+
+from source.handlers import PowerLimiter
+from source.search import STRATEGIES, make_strategy
+from source.simulators import detector_voltage
+
+FREQ_START = 1120
+FREQ_STOP = 1220
+FREQ_STEP = 0.1
+CENTER_FREQ = 1160
+DB_STEP = 10
+STEP_DELAY = 0.3
+
+
+def run(strategy, window, array_freq):
+    steps = 0
+    error = []
+    start = time.perf_counter()
+    hint = None
+    for freq in array_freq:
+        def probe(db):
+            return detector_voltage(db, freq, CENTER_FREQ), 0.01
+
+        voltage, _, hint = strategy.search(probe, window.get_min_limit(freq), window.get_max_limit(freq), hint)
+        steps += len(strategy.probes)
+        error.append(abs(voltage - strategy.target))
+    cpu = time.perf_counter() - start
+    return steps, float(np.mean(error)), float(np.max(error)), cpu
+
+
+def main():
+    array_freq = np.round(np.arange(FREQ_START, FREQ_STOP, FREQ_STEP), 2)
+    window = PowerLimiter(CENTER_FREQ, FREQ_START, FREQ_STOP)
+
+    cases = [("linear (DB_STEP)", make_strategy(DB_STEP, "linear", warm_start=False)),
+             ("linear (1 Дб)", make_strategy(DB_STEP, "linear", resolution=1, warm_start=False))]
+    cases += [(name, make_strategy(DB_STEP, name, resolution=1, tolerance=0.01, warm_start=False))
+              for name in STRATEGIES if name != "linear"]
+    cases += [(f"{name} + подсказка", make_strategy(DB_STEP, name, resolution=1, tolerance=0.01))
+              for name in STRATEGIES]
+
+    print(f"{len(array_freq)} точек, задержка {STEP_DELAY} с на шаг генератора\n")
+    print(f"{'Стратегия':<24}{'Шагов':>8}{'Шаг/точка':>11}{'Время, ч':>10}{'Ср. ошибка':>12}{'Макс. ошибка':>14}")
+    for name, strategy in cases:
+        steps, mean_error, max_error, _ = run(strategy, window, array_freq)
+        hours = steps * STEP_DELAY / 3600
+        print(f"{name:<24}{steps:>8}{steps / len(array_freq):>11.1f}{hours:>10.2f}"
+              f"{mean_error:>12.4f}{max_error:>14.4f}")
+
+
+if __name__ == '__main__':
+    main()
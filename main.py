@@ -1,27 +1,114 @@
+import argparse
+import logging
+import threading
 import warnings
 
-import source.hardware as hardware
-from source.funcs import *
+from source import export
+from source.journal import Journal
 from source.logger import setup_logging
-from source.parsing import config_pars, name_exp_parse
+from source.parsing import experiments_pars, name_exp_parse, section_pars, stations_pars
+from source.pool import instruments
+
+
+def load_experiment_modules():
+    """
+    Модули экспериментов и приборов (numpy, pandas, pyvisa).
+    Импортируются не при запуске, а в фоне или перед подключением к приборам
+    """
+    import source.funcs
+    import source.hardware
+    import source.runner
+    return source.funcs, source.hardware, source.runner
+
+
+def preload():
+    """Импорт модулей экспериментов в фоне, пока оператор вводит параметры РЭМа"""
+    threading.Thread(target=load_experiment_modules, name="preload", daemon=True).start()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Измерение чувствительности РЭМ")
+    parser.add_argument("--resume", nargs="?", const="", default=None, metavar="JOURNAL",
+                        help="продолжить прерванный эксперимент по журналу измерений "
+                             "(по умолчанию - последний журнал в data/)")
+    parser.add_argument("--simulate", action="store_true",
+                        help="работать с имитаторами генератора и осциллографа (секция [Simulator])")
+    parser.add_argument("--factory-reset", action="store_true",
+                        help="сбросить генератор к заводским настройкам при подключении")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="вывести время импорта модулей при запуске и выйти")
+    return parser.parse_args()
 
 
 def main():
     """Точка входа"""
+    args = parse_args()
+    if args.profile_startup:
+        from source.startup import report_startup
+        report_startup()
+        return
+
     warnings.simplefilter(action="ignore", category=FutureWarning)
-    setup_logging()
-    exp_name, variables = config_pars("config.ini")
-    logging.info("Файл config.ini успешно загружен")
+    setup_logging(**section_pars("Logging"))
+    preload()
+
+    options = dict(search=section_pars("Search"),
+                   settling=section_pars("Settling"),
+                   output=section_pars("Output"),
+                   plot=section_pars("Plot"),
+                   window=section_pars("PowerLimiter"),
+                   calibration=section_pars("Calibration"),
+                   sweep=section_pars("Sweep"),
+                   refine=section_pars("Refine"),
+                   averaging=section_pars("Averaging"))
+
+    stations = stations_pars("config.ini")
+    if stations and args.resume is None and not args.simulate:
+        experiments = experiments_pars("config.ini")
+        logging.info(f"Файл config.ini успешно загружен, стендов: {len(stations)}")
+        _, _, runner = load_experiment_modules()
+        runner.ExperimentRunner.from_config(experiments, stations, reset=args.factory_reset, **options).run()
+        return
+
+    if args.resume is None:
+        experiments = experiments_pars("config.ini")
+        logging.info(f"Файл config.ini успешно загружен, экспериментов: {len(experiments)}")
+        names_for_file = name_exp_parse()
+        resume_journal = None
+    else:
+        resume_journal = Journal(args.resume or Journal.latest())
+        experiments = [(resume_journal.header["experiment"], resume_journal.header["variables"])]
+        names_for_file = resume_journal.header["exp_name"]
+        logging.info(f"Продолжение эксперимента {experiments[0][0]} для {names_for_file} "
+                     f"по журналу {resume_journal.path}")
 
-    names_for_file = name_exp_parse()
+    funcs, hardware, _ = load_experiment_modules()
 
-    # Инициализация осциллографа и генератора
-    generator = hardware.RigolDSG815(level=-70, freq=1160)
-    oscilloscope = hardware.AKIP4122()
+    # Инициализация осциллографа и генератора: соединения общие для всех экспериментов
+    if args.simulate:
+        from source.simulators import BenchSimulator
+        simulator = BenchSimulator(**section_pars("Simulator")).start()
+        generator_params = dict(ip=simulator.host, vxi11_port=simulator.generator.port)
+        oscilloscope_params = dict(ip=simulator.host, port=simulator.oscilloscope.port)
+    else:
+        generator_params = dict(network=section_pars("Network"))
+        oscilloscope_params = {}
 
-    exp_class = globals()[exp_name](*variables, oscilloscope, generator, names_for_file)
-    exp_class.start()
+    for exp_name, variables in experiments:
+        # Журнал создается перед запуском своего эксперимента
+        journal = resume_journal or Journal.create(names_for_file, exp_name, variables)
+        generator = instruments.get(hardware.RigolDSG815, level=-70, freq=1160, reset=args.factory_reset,
+                                    **generator_params)
+        oscilloscope = instruments.get(hardware.AKIP4122, **oscilloscope_params)
+        exp_class = getattr(funcs, exp_name)(*variables, oscilloscope, generator, names_for_file, journal=journal,
+                                             **options)
+        exp_class.start()
 
 
 if __name__ == '__main__':
-    main()
+    try:
+        main()
+    finally:
+        instruments.close_all()
+        # Графики и Excel сохраняются в фоне, дожидаемся их перед выходом
+        export.wait()
@@ -0,0 +1,123 @@
+import json
+import logging
+import os
+import threading
+import time
+
+
+class AddressCache:
+    """
+    Кеш сетевых адресов приборов.
+    Ключ - подстрока ответа *IDN? (например "Rigol"), значение - последний
+    известный ip, серийный номер и время записи. Записи старше ttl секунд
+    считаются устаревшими
+    """
+
+    def __init__(self, path: str = "cache/instruments.json", ttl: float = 7 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as file:
+                    self.entries = json.load(file)
+            except (OSError, ValueError):
+                logging.warning(f"Кеш адресов {path} поврежден и будет перезаписан")
+
+    def get(self, key: str):
+        """Запись кеша или None, если ее нет или она устарела"""
+        entry = self.entries.get(key)
+        if entry is None or time.time() - entry["timestamp"] > self.ttl:
+            return None
+        return entry
+
+    def put(self, key: str, ip: str, serial: str | None = None):
+        self.entries[key] = {"ip": ip, "serial": serial, "timestamp": time.time()}
+        self.__save()
+
+    def invalidate(self, key: str):
+        if self.entries.pop(key, None) is not None:
+            self.__save()
+
+    def __save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self.entries, file, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+
+class CalibrationCache:
+    """
+    Кеш оптимальных уровней РЭМа.
+    Ключ - имя РЭМа (номер, схема, экран, прошивка из name_exp_parse) и сетка
+    частот эксперимента, значение - последний найденный уровень [Дб] и напряжение
+    на каждой частоте. Уровень из кеша используется как подсказка для поиска;
+    если напряжение на нем ушло от сохраненного больше чем на tolerance [В],
+    запись удаляется и заменяется результатом нового поиска
+    """
+
+    # Несколько стендов могут сохранять кеш одновременно
+    _lock = threading.Lock()
+
+    def __init__(self, dut: str, grid: str, path: str = "cache/calibration.json", tolerance: float = 0.05):
+        self.key = f"{dut}|{grid}"
+        self.path = path
+        self.tolerance = tolerance
+        self.levels = self.__load().get(self.key, {}).get("levels", {})
+        self.drifted = 0
+
+    @staticmethod
+    def grid(freq_start, freq_stop, freq_step, center_freq):
+        """Ключ сетки частот"""
+        return f"{freq_start}-{freq_stop}/{freq_step}@{center_freq}"
+
+    def get(self, freq):
+        """Запись {"db", "voltage"} для частоты или None"""
+        return self.levels.get(self.__freq_key(freq))
+
+    def put(self, freq, db, voltage):
+        self.levels[self.__freq_key(freq)] = {"db": db, "voltage": float(voltage)}
+
+    def verify(self, freq, voltage):
+        """
+        Проверка записи по напряжению, измеренному на уровне из кеша.
+        При уходе больше tolerance запись удаляется, возвращает True если запись верна
+        """
+        entry = self.get(freq)
+        if entry is None:
+            return False
+        if abs(voltage - entry["voltage"]) <= self.tolerance:
+            return True
+        logging.debug(f"Уровень из кеша калибровки для {freq}Мгц устарел: "
+                      f"{entry['voltage']:.3f}В -> {voltage:.3f}В")
+        del self.levels[self.__freq_key(freq)]
+        self.drifted += 1
+        return False
+
+    def save(self):
+        """Сохранить записи этого РЭМа (записи других РЭМов не затрагиваются)"""
+        with self._lock:
+            entries = self.__load()
+            entries[self.key] = {"levels": self.levels, "timestamp": time.time()}
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            temp_path = f"{self.path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(entries, file, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        if self.drifted:
+            logging.warning(f"Кеш калибровки {self.key}: обновлено {self.drifted} устаревших уровней")
+
+    @staticmethod
+    def __freq_key(freq):
+        return freq if isinstance(freq, str) else f"{float(freq):.2f}"
+
+    def __load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            logging.warning(f"Кеш калибровки {self.path} поврежден и будет перезаписан")
+            return {}
@@ -0,0 +1,135 @@
+"""
+Фоновый экспорт результатов (PNG, Excel) в пуле процессов.
+
+Задачи выполняются в отдельных процессах с backend Agg и не задерживают
+измерения. Пул создается при первой задаче, все задачи дожидаются в wait(),
+который вызывается при завершении программы (и дополнительно через atexit).
+"""
+import atexit
+import concurrent.futures
+import logging
+import math
+import os
+import threading
+
+_pool = None
+_futures = []
+_lock = threading.Lock()
+
+
+def _init_worker():
+    os.environ["MPLBACKEND"] = "Agg"
+
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            import multiprocessing
+
+            # spawn: дочерние процессы не наследуют потоки стендов и соединения с приборами
+            _pool = concurrent.futures.ProcessPoolExecutor(max_workers=min(4, os.cpu_count() or 1),
+                                                           mp_context=multiprocessing.get_context("spawn"),
+                                                           initializer=_init_worker)
+            atexit.register(wait)
+        return _pool
+
+
+def _warm_up():
+    import source.handlers  # noqa: F401
+
+
+def warm_up():
+    """Запустить процесс пула заранее, чтобы импорт matplotlib и pandas шел параллельно с измерениями"""
+    _get_pool().submit(_warm_up)
+
+
+def submit(description: str, function, *args, background: bool = True):
+    """
+    Поставить задачу экспорта в очередь (или выполнить сразу при background=False).
+    description - что сохраняется, для сообщений в логе
+    """
+    if not background:
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(function(*args))
+            logging.info(f"Сохранено: {description}")
+        except Exception as error:
+            logging.error(f"Ошибка экспорта ({description}): {error}")
+            future.set_exception(error)
+        return future
+
+    try:
+        future = _get_pool().submit(function, *args)
+    except concurrent.futures.BrokenExecutor:
+        # Процесс пула аварийно завершился: пул пересоздается при следующей задаче
+        _reset_pool()
+        logging.error(f"Пул экспорта неисправен, {description} сохраняется в основном процессе")
+        return submit(description, function, *args, background=False)
+    future.add_done_callback(lambda done: _report(description, done))
+    with _lock:
+        _futures.append(future)
+    return future
+
+
+def _reset_pool():
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+def wait():
+    """Дождаться всех задач экспорта и закрыть пул"""
+    global _pool
+    with _lock:
+        futures, pool = list(_futures), _pool
+        _futures.clear()
+        _pool = None
+    if futures:
+        logging.info(f"Ожидание завершения экспорта: {sum(not future.done() for future in futures)} задач")
+    concurrent.futures.wait(futures)
+    if pool is not None:
+        pool.shutdown()
+
+
+def _report(description, future):
+    error = future.exception()
+    if error is not None:
+        logging.error(f"Ошибка экспорта ({description}): {error}")
+    else:
+        logging.info(f"Сохранено: {description}")
+
+
+def write_excel(path: str, sheets: dict):
+    """
+    Потоковая запись листов Excel (openpyxl write_only): строки сразу
+    уходят в файл, память не зависит от числа точек.
+    sheets - {имя листа: {колонка: массив}}
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for name, columns in sheets.items():
+        sheet = workbook.create_sheet(name)
+        sheet.append(list(columns))
+        for row in zip(*(values.tolist() for values in columns.values())):
+            sheet.append([None if isinstance(value, float) and math.isnan(value) else value for value in row])
+    workbook.save(path)
+
+
+def write_figures(figures: list):
+    """Сохранение графиков: список (x, y, xlabel, ylabel, path)"""
+    from source.handlers import save_figure
+
+    for figure in figures:
+        save_figure(*figure)
+
+
+def write_band_figures(figures: list):
+    """Сохранение графиков с полосами: список аргументов save_band_figure"""
+    from source.handlers import save_band_figure
+
+    for figure in figures:
+        save_band_figure(*figure)
@@ -3,8 +3,86 @@ import time
 
 import numpy as np
 
-from source.handlers import PowerLimiter, ConvertData, Calculation
+from source.cache import CalibrationCache
+from source.handlers import PowerLimiter, ConvertData, Calculation, summarize_runs
 from source.interfaces import Generator, Oscilloscope
+from source.journal import Journal
+from source.metrics import EtaEstimator, Instrumentation, format_duration
+from source.refine import RefinementPlanner
+from source.search import make_strategy
+from source.settling import RepeatedReading, SettlingDetector
+from source.sweep import ListSweep
+
+# Вызовы приборов, время которых попадает в статистику
+GENERATOR_CALLS = ("configure", "set_level", "set_freq", "out_on", "out_off",
+                   "load_sweep", "start_sweep", "trigger", "stop_sweep")
+OSCILLOSCOPE_CALLS = ("get_all", "get_mean", "get_pkp")
+
+
+def calibrate_center(calculation: Calculation, center_freq, journal: Journal,
+                     calibration: CalibrationCache | None = None):
+    """
+    Поиск оптимального уровня на центральной частоте.
+    При продолжении эксперимента калибровка берется из журнала,
+    уровень из кеша калибровки РЭМа используется как подсказка.
+    Возвращает (voltage, pkp, db, settle_time)
+    """
+    if journal.center is not None:
+        center = journal.center
+        calculation.center_voltage = center["voltage"]
+        logging.info("Калибровка на центральной частоте восстановлена из журнала")
+        return center["voltage"], center["pkp"], center["db"], center["settle"]
+
+    voltage, pkp, db = search_with_calibration(calculation, "center", calibration, center_freq, flag=True)
+    journal.add_center(voltage, pkp, db, calculation.settle_time)
+    return voltage, pkp, db, calculation.settle_time
+
+
+def make_calibration(exp_name, freq_start, freq_stop, freq_step, center_freq, calibration: dict | None):
+    """Кеш калибровки РЭМа по параметрам секции [Calibration] или None, если он отключен"""
+    calibration = dict(calibration or {})
+    if not calibration.pop("enabled", 1):
+        return None
+    return CalibrationCache(exp_name, CalibrationCache.grid(freq_start, freq_stop, freq_step, center_freq),
+                            **calibration)
+
+
+def make_planner(num_elements, freq_step, refine: dict | None):
+    """Планировщик адаптивной сетки частот по параметрам секции [Refine] или None, если он отключен"""
+    refine = dict(refine or {})
+    if not refine.pop("enabled", 0):
+        return None
+    return RefinementPlanner(num_elements, freq_step, **refine)
+
+
+def search_with_calibration(calculation: Calculation, key, calibration: CalibrationCache | None, freq,
+                            flag=False, limits=None):
+    """
+    Поиск уровня, начиная с уровня из кеша калибровки: проверка уровня из кеша
+    и соседнего с ним обычно занимает один-два шага генератора.
+    Запись кеша проверяется по напряжению на уровне из кеша и обновляется
+    найденным уровнем
+    """
+    cached = calibration.get(key) if calibration is not None else None
+    seed = cached["db"] if cached is not None else None
+    voltage, pkp, db = calculation.search_optimal_level(freq, flag=flag, limits=limits, seed=seed)
+    if calibration is not None:
+        if cached is not None:
+            probe = calculation.strategy.probes.get(seed)
+            db_min, db_max = limits or calculation.limits(freq)
+            if probe is None and db_min <= seed <= db_max:
+                # Уровень из кеша не узел сетки поиска (кеш записан с другим шагом) - проверка отдельным шагом
+                probe = calculation.probe(seed)
+            if probe is not None:
+                calibration.verify(key, probe[0])
+        calibration.put(key, db, voltage)
+    return voltage, pkp, db
+
+
+def run_metadata(experiment: str, variables: list, osc, gen, **config):
+    """Метаданные эксперимента для файла результатов: параметры, приборы и их прошивки, настройки"""
+    return dict(experiment=experiment, variables=variables,
+                generator=getattr(gen, "idn", None), oscilloscope=getattr(osc, "idn", None), config=config)
 
 
 class SearchOptimalLevel:
@@ -18,7 +96,19 @@ class SearchOptimalLevel:
                  db_step: int,
                  osc: Oscilloscope,
                  gen: Generator,
-                 exp_name):
+                 exp_name,
+                 search: dict | None = None,
+                 settling: dict | None = None,
+                 output: dict | None = None,
+                 plot: dict | None = None,
+                 journal: Journal | None = None,
+                 window: dict | None = None,
+                 calibration: dict | None = None,
+                 sweep: dict | None = None,
+                 refine: dict | None = None,
+                 averaging: dict | None = None,
+                 dut: str | None = None):
+        # sweep не используется: уровень на каждой частоте подбирается поиском
         self.calculation = None
         self.freq_start = freq_start
         self.freq_stop = freq_stop
@@ -28,6 +118,9 @@ class SearchOptimalLevel:
         self.center_db = None
         self.center_pkp = None
         self.db_step = db_step
+        self.search = search or {}
+        self.settling = settling or {}
+        self.averaging = averaging or {}
         self.osc = osc
         self.gen = gen
 
@@ -35,61 +128,121 @@ class SearchOptimalLevel:
         self.array_freq = np.arange(self.freq_start, self.freq_stop, self.freq_step)
         # Кол-во элементов массива
         self.num_elements = self.array_freq.shape[0]
-        # Создаем пустой массив для напряжений и PKP
-        self.voltage_list = np.empty(self.num_elements)
-        self.pkp_list = np.empty(self.num_elements)
-        self.db_list = np.empty(self.num_elements)
-        self.l_list = np.empty(self.num_elements)
-
-        self.window = PowerLimiter(center_freq, freq_start, freq_stop)
-        self.convert = ConvertData(exp_name)
+        # Массивы по частотам, NaN - точка не измерялась
+        self.voltage_list = np.full(self.num_elements, np.nan)
+        self.pkp_list = np.full(self.num_elements, np.nan)
+        self.db_list = np.full(self.num_elements, np.nan)
+        self.l_list = np.full(self.num_elements, np.nan)
+        self.planner = make_planner(self.num_elements, freq_step, refine)
+
+        self.window = PowerLimiter(center_freq, freq_start, freq_stop, **(window or {}))
+        # Окна уровней для всех частот
+        self.min_limits, self.max_limits = self.window.get_limits(np.round(self.array_freq, 2))
+        variables = [freq_start, freq_stop, freq_step, center_freq, db_step]
+        metadata = run_metadata(type(self).__name__, variables, osc, gen,
+                                search=self.search, settling=self.settling, averaging=self.averaging,
+                                window=window or {})
+        self.convert = ConvertData(exp_name, plot=dict(plot or {}, capacity=self.num_elements,
+                                                       sort=self.planner is not None),
+                                   metadata=metadata, **(output or {}))
+        self.metrics = Instrumentation()
+        self.journal = journal or Journal.create(exp_name, type(self).__name__, variables)
+        # Кеш калибровки привязан к РЭМу, exp_name может содержать еще и каталог стенда
+        self.calibration = make_calibration(dut or exp_name, freq_start, freq_stop, freq_step, center_freq,
+                                            calibration)
         logging.info("Настройка класса для определения оптимального уровня успешно выполнена")
 
     def start(self):
         logging.info("Старт эксперемента...")
+        self.metrics.instrument(self.gen, GENERATOR_CALLS, "generator")
+        self.metrics.instrument(self.osc, OSCILLOSCOPE_CALLS, "oscilloscope")
         self.gen.out_on()
-        self.calculation = Calculation(self.osc, self.gen, self.db_step, self.window)
-        self.center_voltage, self.center_pkp, self.center_db = self.calculation.search_optimal_level(self.center_freq,
-                                                                                                     flag=True)
+        self.calculation = Calculation(self.osc, self.gen, self.db_step, self.window,
+                                       make_strategy(self.db_step, **self.search),
+                                       SettlingDetector(self.osc, **self.settling),
+                                       RepeatedReading(self.osc, **self.averaging))
+        self.metrics.instrument(self.calculation.settling, ("wait",), "settling")
+        eta = EtaEstimator()
+        self.center_voltage, self.center_pkp, self.center_db, center_settle = calibrate_center(self.calculation,
+                                                                                               self.center_freq,
+                                                                                               self.journal,
+                                                                                               self.calibration)
 
-        for i in range(self.num_elements):
-            start_time = time.time()
+        order = self.planner.indices(self.l_list) if self.planner is not None else range(self.num_elements)
+        for k, i in enumerate(order):
+            start_time = time.perf_counter()
+            measured = False
             freq = np.round(self.array_freq[i], 2)
             if int(freq) == int(self.center_freq):
+                voltage, pkp, db = self.center_voltage, self.center_pkp, self.center_db
                 l = self.calculation.calculate_l(self.center_voltage, self.center_db)
+                self.voltage_list[i], self.pkp_list[i], self.db_list[i], self.l_list[i] = voltage, pkp, db, l
+                self.calculation.hint = self.center_db
                 self.convert.flush_to_csv(Частота=self.center_freq,
                                           Уровень=self.center_db,
                                           Напряжение=self.center_voltage,
                                           Разброс=self.center_pkp,
-                                          Чувствительность=l)
+                                          Чувствительность=l,
+                                          Установление=center_settle)
                 self.convert.update_plot(self.center_freq, l)
             else:
-                self.gen.set_level(self.window.get_min_limit(freq))
-                self.gen.set_freq(freq)
-                voltage, pkp, db = self.calculation.search_optimal_level(freq, flag=False)
-                l = self.calculation.calculate_l(voltage, db)
+                record = self.journal.point(i)
+                if record is None:
+                    limits = int(self.min_limits[i]), int(self.max_limits[i])
+                    cached = self.calibration.get(freq) if self.calibration is not None else None
+                    seed = cached["db"] if cached is not None else None
+                    # Частота и первый уровень поиска одной командой
+                    self.gen.configure(freq=freq, level=self.calculation.start_level(limits, seed))
+                    voltage, pkp, db = search_with_calibration(self.calculation, freq, self.calibration, freq,
+                                                               limits=limits)
+                    l = self.calculation.calculate_l(voltage, db)
+                    settle = self.calculation.settle_time
+                    self.journal.add_point(i, freq, db, voltage, pkp, l, settle)
+                    measured = True
+                else:
+                    voltage, pkp, db = record["voltage"], record["pkp"], record["level"]
+                    l, settle = record["sensitivity"], record["settle"]
+                    self.calculation.hint = db
                 self.voltage_list[i], self.pkp_list[i], self.db_list[i], self.l_list[i] = voltage, pkp, db, l
 
                 self.convert.flush_to_csv(Частота=freq,
                                           Уровень=db,
                                           Напряжение=voltage,
                                           Разброс=pkp,
-                                          Чувствительность=l)
+                                          Чувствительность=l,
+                                          Установление=settle)
 
                 self.convert.update_plot(freq, l)
 
-            end_time = (time.time() - start_time) * (self.num_elements - i)
-            hours = int(end_time // 3600)
-            minutes = int((end_time % 3600) // 60)
-            seconds = int(end_time % 60)
+            if measured:
+                point_time = time.perf_counter() - start_time
+                self.metrics.record("point", point_time)
+                eta.update(point_time)
 
-            logging.info(f"Измерение {i} из {self.num_elements}\n"
+            remaining = self.planner.remaining() if self.planner is not None else self.num_elements - k - 1
+            logging.info(f"Измерение {k} из {k + remaining + 1}\n"
                          f"Уровень = {db}Дб, Частота = {freq}Мгц, Напряжение = {voltage}В\n"
-                         f"Примерное оставшееся время = {hours}ч {minutes}м {seconds}с\n")
+                         f"Примерное оставшееся время = {format_duration(eta.remaining(remaining))}\n")
+
+        if self.planner is not None:
+            logging.info(f"Адаптивная сетка: измерено {self.planner.planned} из {self.num_elements} частот")
 
-        self.gen.disconnect()
-        self.osc.disconnect()
+        # При продолжении завершенного журнала измерений нет
+        if self.calculation.reading.history:
+            logging.info(f"Среднее время установления = {np.mean(self.calculation.settling.history):.3f}с, "
+                         f"измерений осциллографа = {len(self.calculation.settling.history)}, "
+                         f"чтений на измерение = {np.mean(self.calculation.reading.history):.2f}")
 
+        # Соединения остаются открытыми для следующего эксперимента (source.pool)
+        self.gen.out_off()
+        self.metrics.log_summary()
+        self.metrics.restore()
+
+        # Сначала основной результат (.npz), журнал и кеш, затем необязательный экспорт
+        self.convert.close()
+        self.journal.close()
+        if self.calibration is not None:
+            self.calibration.save()
         self.convert.convert_to_png()
         self.convert.csv_to_excel()
 
@@ -106,7 +259,18 @@ class Linear:
                  count_measurements: int,
                  osc: Oscilloscope,
                  gen: Generator,
-                 exp_name):
+                 exp_name,
+                 search: dict | None = None,
+                 settling: dict | None = None,
+                 output: dict | None = None,
+                 plot: dict | None = None,
+                 journal: Journal | None = None,
+                 window: dict | None = None,
+                 calibration: dict | None = None,
+                 sweep: dict | None = None,
+                 refine: dict | None = None,
+                 averaging: dict | None = None,
+                 dut: str | None = None):
 
         self.convert = None
         self.calculation = None
@@ -122,71 +286,152 @@ class Linear:
         self.gen = gen
         self.count_measurements = count_measurements
         self.exp_name = exp_name
+        self.search = search or {}
+        self.settling = settling or {}
+        self.averaging = averaging or {}
+        self.output = output or {}
+        # Режим перестройки: point - поточечно, list - list-свип генератора (параметры ListSweep)
+        self.sweep = dict(sweep or {})
+        self.sweep_mode = self.sweep.pop("mode", "point")
+        if self.sweep_mode not in ("point", "list"):
+            logging.error(f"Неизвестный режим перестройки генератора: {self.sweep_mode}")
+            raise ValueError(f"Неизвестный режим перестройки генератора: {self.sweep_mode}")
 
         # Массив частот
         self.array_freq = np.arange(self.freq_start, self.freq_stop, self.freq_step)
         # Кол-во элементов массива
         self.num_elements = self.array_freq.shape[0]
-        # Создаем пустой массив для напряжений и PKP
-        self.voltage_list = np.empty(self.num_elements)
-        self.pkp_list = np.empty(self.num_elements)
-        self.db_list = np.empty(self.num_elements)
-        self.l_list = np.empty(self.num_elements)
+        # Массивы (измерение, частота) для всех повторов, NaN - точка еще не измерена
+        shape = (self.count_measurements, self.num_elements)
+        self.voltage_list = np.full(shape, np.nan)
+        self.pkp_list = np.full(shape, np.nan)
+        self.db_list = np.full(shape, np.nan)
+        self.l_list = np.full(shape, np.nan)
+        self.settle_list = np.full(shape, np.nan)
 
-        self.window = PowerLimiter(center_freq, freq_start, freq_stop)
+        # Сетка частот выбирается в первом повторе, остальные повторы измеряют те же частоты
+        self.planner = make_planner(self.num_elements, freq_step, refine)
+        self.plot = dict(plot or {}, capacity=self.count_measurements * self.num_elements,
+                         sort=self.planner is not None)
+        self.metrics = Instrumentation()
+        self.window = PowerLimiter(center_freq, freq_start, freq_stop, **(window or {}))
+        self.variables = [freq_start, freq_stop, freq_step, center_freq, db, count_measurements]
+        self.window_config = window or {}
+        self.journal = journal or Journal.create(exp_name, type(self).__name__, self.variables)
+        # Из кеша калибровки РЭМа используется только уровень на центральной частоте
+        self.calibration = make_calibration(dut or exp_name, freq_start, freq_stop, freq_step, center_freq,
+                                            calibration)
         logging.info("Настройка класса для измерения линейного изменения частот на одном уровне успешно выполнена")
 
     def start(self):
         logging.info("Старт эксперемента...")
+        self.metrics.instrument(self.gen, GENERATOR_CALLS, "generator")
+        self.metrics.instrument(self.osc, OSCILLOSCOPE_CALLS, "oscilloscope")
         self.gen.out_on()
-        self.calculation = Calculation(self.osc, self.gen, 10, self.window)
-        self.center_voltage, self.center_pkp, self.center_db = self.calculation.search_optimal_level(self.center_freq,
-                                                                                                     flag=True)
+        settling = self.metrics.instrument(SettlingDetector(self.osc, **self.settling), ("wait",), "settling")
+        eta = EtaEstimator()
+        reading = RepeatedReading(self.osc, **self.averaging)
+        self.calculation = Calculation(self.osc, self.gen, 10, self.window, make_strategy(10, **self.search), settling,
+                                       reading)
+        self.center_voltage, self.center_pkp, self.center_db, _ = calibrate_center(self.calculation,
+                                                                                   self.center_freq,
+                                                                                   self.journal,
+                                                                                   self.calibration)
+
+        # Все повторы пишутся в один файл, номер повтора - в колонке "Измерение"
+        metadata = run_metadata(type(self).__name__, self.variables, self.osc, self.gen,
+                                search=self.search, settling=self.settling, averaging=self.averaging,
+                                window=self.window_config)
+        self.convert = ConvertData(self.exp_name, plot=self.plot, columns=["Измерение"] + ConvertData.COLUMNS,
+                                   metadata=metadata, **self.output)
 
         for j in range(1, self.count_measurements + 1):
-            # Создаем пустой массив для напряжений и PKP
-            self.voltage_list = np.empty(self.num_elements)
-            self.pkp_list = np.empty(self.num_elements)
-            self.db_list = np.empty(self.num_elements)
-            self.l_list = np.empty(self.num_elements)
-            self.convert = ConvertData(self.exp_name)
-
-            for i in range(self.num_elements):
-                start_time = time.time()
-                if i == self.center_freq:
-                    l = self.calculation.calculate_l(self.center_voltage, self.center_db)
-                    self.convert.flush_to_csv(Частота=self.center_freq,
-                                              Уровень=self.center_db,
-                                              Напряжение=self.center_voltage,
-                                              Разброс=self.center_pkp,
-                                              Чувствительность=l)
-                    self.convert.update_plot(self.center_freq, l)
+            run = j - 1
+            if self.planner is None:
+                order = range(self.num_elements)
+            elif j == 1:
+                order = self.planner.indices(self.l_list[0])
+            else:
+                order = np.flatnonzero(~np.isnan(self.l_list[0]))
+            readings = None
+            # Первый повтор адаптивной сетки измеряется поточечно: следующая частота зависит от измерений
+            if self.sweep_mode == "list" and not (self.planner is not None and j == 1):
+                # Все неизмеренные точки повтора - одним свипом, показания приходят по мере прохода
+                pending = [i for i in order if self.journal.point(i, run=j) is None]
+                readings = ListSweep(self.gen, self.osc, settling, reading,
+                                     **self.sweep).readings(self.array_freq[pending], self.db)
+            for k, i in enumerate(order):
+                start_time = time.perf_counter()
+                measured = False
+                freq = np.round(self.array_freq[i], 2)
+                record = self.journal.point(i, run=j)
+                if record is None:
+                    if readings is not None:
+                        voltage, pkp, settle_time = next(readings)
+                    else:
+                        self.gen.configure(freq=self.array_freq[i], level=self.db)
+                        data, settle_time = settling.wait()
+                        voltage, pkp = reading.measure(data)
+
+                    self.voltage_list[run, i], self.pkp_list[run, i] = voltage, pkp
+                    self.db_list[run, i] = self.db
+                    self.l_list[run, i] = self.calculation.calculate_l(self.voltage_list[run, i], self.db)
+                    self.journal.add_point(i, self.array_freq[i], self.db, self.voltage_list[run, i],
+                                           self.pkp_list[run, i], self.l_list[run, i], settle_time, run=j)
+                    measured = True
+                else:
+                    self.voltage_list[run, i], self.pkp_list[run, i] = record["voltage"], record["pkp"]
+                    self.db_list[run, i], self.l_list[run, i] = record["level"], record["sensitivity"]
+                    settle_time = record["settle"]
+                self.settle_list[run, i] = settle_time
+                self.convert.flush_to_csv(Измерение=j,
+                                          Частота=freq,
+                                          Уровень=self.db,
+                                          Напряжение=self.voltage_list[run, i],
+                                          Разброс=self.pkp_list[run, i],
+                                          Чувствительность=self.l_list[run, i],
+                                          Установление=settle_time)
+                self.convert.update_plot(freq, self.l_list[run, i])
+
+                if measured:
+                    point_time = time.perf_counter() - start_time
+                    self.metrics.record("point", point_time)
+                    eta.update(point_time)
+                if self.planner is not None and j == 1:
+                    remaining = self.planner.remaining()
+                    total = k + remaining + 1
                 else:
-                    self.gen.set_freq(self.array_freq[i])
-                    time.sleep(0.3)
-                    data = self.osc.get_all()
-
-                    self.voltage_list[i] = self.osc.convert_voltage(data["AVERage"])
-                    self.pkp_list[i] = self.osc.convert_voltage(data["PKPK"])
-                    self.db_list[i] = self.db
-                    self.l_list[i] = self.calculation.calculate_l(self.voltage_list[i], self.db)
-                    self.convert.flush_to_csv(Частота=i,
-                                              Уровень=self.db,
-                                              Напряжение=self.voltage_list[i],
-                                              Разброс=self.pkp_list[i],
-                                              Чувствительность=self.l_list[i])
-                    self.convert.update_plot(i, self.l_list[i])
-
-                end_time = (time.time() - start_time) * (
-                        (self.num_elements - i) + (self.count_measurements - j) * self.num_elements)
-                hours = int(end_time // 3600)
-                minutes = int((end_time % 3600) // 60)
-                seconds = int(end_time % 60)
+                    total = len(order)
+                    remaining = total - k - 1
+                end_time = eta.remaining(remaining + (self.count_measurements - j) * total)
 
                 logging.info(f"Измерение {j} из {self.count_measurements}\n"
-                             f"{int(i / self.num_elements * 100)}%\n"
-                             f"Уровень = {self.db}Дб, Частота = {self.array_freq[i]}Мгц, Напряжение = {self.voltage_list[i]}В"
-                             f"Примерное оставшееся время = {hours}ч {minutes}м {seconds}с\n")
+                             f"{int(k / total * 100)}%\n"
+                             f"Уровень = {self.db}Дб, Частота = {self.array_freq[i]}Мгц, Напряжение = {self.voltage_list[run, i]}В"
+                             f"Примерное оставшееся время = {format_duration(end_time)}\n")
+            if readings is not None:
+                # Остановка свипа после последней точки
+                next(readings, None)
 
-            self.convert.convert_to_png()
-            self.convert.csv_to_excel()
+        if self.planner is not None:
+            logging.info(f"Адаптивная сетка: измерено {self.planner.planned} из {self.num_elements} частот")
+        if reading.history:
+            logging.info(f"Чтений осциллографа на измерение = {np.mean(reading.history):.2f}")
+
+        self.gen.out_off()
+        self.metrics.log_summary()
+        self.metrics.restore()
+
+        # Сначала основной результат (.npz), журнал и кеш, затем необязательный экспорт
+        self.convert.close()
+        self.journal.close()
+        if self.calibration is not None:
+            self.calibration.save()
+        # В сводку попадают только измеренные частоты (адаптивная сетка неравномерна)
+        measured = ~np.isnan(self.l_list).all(axis=0)
+        self.convert.save_summary(summarize_runs(np.round(self.array_freq[measured], 2),
+                                                 {"Напряжение": self.voltage_list[:, measured],
+                                                  "Разброс": self.pkp_list[:, measured],
+                                                  "Чувствительность": self.l_list[:, measured],
+                                                  "Установление": self.settle_list[:, measured]}))
+        self.convert.csv_to_excel()
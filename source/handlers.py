@@ -1,15 +1,188 @@
+import csv
 import datetime
+import json
 import logging
 import os
 import time
+import warnings
 
-import pandas as pd
-from matplotlib import pyplot as plt
+import numpy as np
+
+from source import export
+from source.plotting import LivePlot
+from source.search import LinearSearch
+from source.settling import RepeatedReading, SettlingDetector
+
+
+def save_figure(x, y, xlabel, ylabel, path, dpi=600):
+    """
+    Сохранение графика в PNG.
+    Используется отдельный Figure без pyplot, поэтому функцию можно
+    вызывать из нескольких потоков одновременно.
+    matplotlib импортируется при первом вызове, чтобы не замедлять запуск программы
+    """
+    from matplotlib import style
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    with style.context("ggplot"):
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        ax.plot(x, y)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        for spine in ax.spines.values():
+            spine.set_color('black')
+            spine.set_linewidth(1.5)
+        ax.set_facecolor('white')
+        ax.grid(color='gray', alpha=0.7, linestyle='--')
+        fig.savefig(path, dpi=dpi)
+
+
+def save_band_figure(x, mean, std, low, high, xlabel, ylabel, path, dpi=600):
+    """Сохранение графика среднего по повторным измерениям с полосами СКО и минимума/максимума"""
+    from matplotlib import style
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    with style.context("ggplot"):
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        ax.fill_between(x, low, high, alpha=0.2, label='мин/макс')
+        ax.fill_between(x, mean - std, mean + std, alpha=0.4, label='СКО')
+        ax.plot(x, mean, label='среднее')
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        for spine in ax.spines.values():
+            spine.set_color('black')
+            spine.set_linewidth(1.5)
+        ax.set_facecolor('white')
+        ax.grid(color='gray', alpha=0.7, linestyle='--')
+        ax.legend()
+        fig.savefig(path, dpi=dpi)
+
+
+def summarize_runs(freq, runs: dict):
+    """
+    Сводная таблица повторных измерений.
+    runs - массивы (кол-во измерений, кол-во частот) по каждой величине,
+    для каждой частоты считаются среднее, СКО, минимум и максимум.
+    Неизмеренные точки (NaN) не учитываются
+    """
+    import pandas as pd
+
+    columns = {"Частота": np.asarray(freq)}
+    with warnings.catch_warnings():
+        # Частоты без единого измерения дают NaN
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        for name, values in runs.items():
+            ddof = 1 if values.shape[0] > 1 else 0
+            columns[f"{name}_среднее"] = np.nanmean(values, axis=0)
+            columns[f"{name}_СКО"] = np.nanstd(values, axis=0, ddof=ddof)
+            columns[f"{name}_мин"] = np.nanmin(values, axis=0)
+            columns[f"{name}_макс"] = np.nanmax(values, axis=0)
+    return pd.DataFrame(columns)
+
+
+class ResultSink:
+    """
+    Потоковая запись результатов в CSV.
+    Файл остается открытым, каждая точка дописывается одной строкой,
+    сброс на диск - каждые flush_rows строк или flush_interval секунд
+    """
+
+    def __init__(self, path: str, columns: list, flush_rows: int = 10, flush_interval: float = 1.0):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.rows = 0
+        self.__pending = 0
+        self.__last_flush = time.monotonic()
+        self.__file = open(path, "w", newline="", encoding="utf-8")
+        self.__writer = csv.DictWriter(self.__file, fieldnames=columns)
+        self.__writer.writeheader()
+        self.__file.flush()
+
+    def write(self, row: dict):
+        """Дописать строку результатов"""
+        self.__writer.writerow(row)
+        self.rows += 1
+        self.__pending += 1
+        if self.__pending >= self.flush_rows or time.monotonic() - self.__last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Сбросить буфер на диск"""
+        if not self.__file.closed:
+            self.__file.flush()
+        self.__pending = 0
+        self.__last_flush = time.monotonic()
+
+    def close(self):
+        """Закрыть файл"""
+        if not self.__file.closed:
+            self.__file.close()
+
+
+class ColumnStore:
+    """
+    Колонки результатов в памяти (массивы NumPy с удвоением при заполнении)
+    и их сохранение в несжатый .npz вместе с метаданными эксперимента.
+    Файл .npz читается без разбора текста: load(path) для 10^6 точек
+    занимает миллисекунды
+    """
+
+    METADATA = "__metadata__"
+
+    def __init__(self, columns: list, capacity: int = 1024):
+        self.columns = list(columns)
+        self.size = 0
+        self.__data = {column: np.full(max(int(capacity), 1), np.nan) for column in self.columns}
+
+    def append(self, row: dict):
+        if self.size == len(self.__data[self.columns[0]]):
+            for column in self.columns:
+                self.__data[column] = np.resize(self.__data[column], 2 * self.size)
+        for column in self.columns:
+            self.__data[column][self.size] = row.get(column, np.nan)
+        self.size += 1
+
+    def arrays(self):
+        """Заполненная часть колонок (без копирования)"""
+        return {column: values[:self.size] for column, values in self.__data.items()}
+
+    def save(self, path: str, metadata: dict | None = None):
+        """Атомарная запись колонок и метаданных (JSON) в .npz"""
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, **self.arrays(),
+                 **{self.METADATA: np.array(json.dumps(metadata or {}, ensure_ascii=False, default=str))})
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str):
+        """Колонки и метаданные из .npz: (dict массивов, dict метаданных)"""
+        with np.load(path) as file:
+            columns = {name: file[name] for name in file.files if name != cls.METADATA}
+            metadata = json.loads(file[cls.METADATA].item()) if cls.METADATA in file.files else {}
+        return columns, metadata
+
+
+def load_results(path: str):
+    """Результаты эксперимента из .npz: (DataFrame, метаданные)"""
+    import pandas as pd
+
+    columns, metadata = ColumnStore.load(path)
+    return pd.DataFrame(columns), metadata
 
 
 class ConvertData:
-    def __init__(self, exp_name):
-        self.data = {}
+    COLUMNS = ['Частота', 'Уровень', 'Напряжение', 'Разброс', 'Чувствительность', 'Установление']
+
+    def __init__(self, exp_name, flush_rows: int = 10, flush_interval: float = 1.0, plot: dict | None = None,
+                 columns: list | None = None, csv: bool = True, excel: bool = True, metadata: dict | None = None,
+                 background: bool = True):
         self.path_to_csv = (f"data/"
                             f"{datetime.date.today().strftime('%d.%m.%Y')}/"
                             f"{exp_name}_"
@@ -23,135 +196,179 @@ class ConvertData:
         os.makedirs(os.path.dirname(self.path_to_csv), exist_ok=True)
         os.makedirs(os.path.dirname(self.path_to_png), exist_ok=True)
 
-        self.df = pd.DataFrame(columns=['Частота', 'Уровень', 'Напряжение', 'Разброс', 'Чувствительность'])
+        columns = columns or self.COLUMNS
+        self.store = ColumnStore(columns, (plot or {}).get("capacity", 1024))
+        self.metadata = dict(metadata or {}, exp_name=exp_name,
+                             created=datetime.datetime.now().isoformat(timespec="seconds"))
+        # CSV и Excel - необязательные представления данных .npz
+        self.sink = ResultSink(f"{self.path_to_csv}.csv", columns, flush_rows, flush_interval) if csv else None
+        self.excel = bool(excel)
+        # PNG и Excel сохраняются в пуле процессов (source.export), не задерживая измерения
+        self.background = bool(background)
+        if self.background:
+            export.warm_up()
+        self.summary = None
 
-        self.init_plot()
+        self.init_plot(**(plot or {}))
 
     def flush_to_csv(self, **data):
-        self.data = data
-        self.df = self.df.append(self.data, ignore_index=True)
-        self.df.to_csv(f"{self.path_to_csv}.csv")
+        self.store.append(data)
+        if self.sink is not None:
+            self.sink.write(data)
 
     def convert_to_png(self):
-        df = pd.read_csv(f"{self.path_to_csv}.csv")
-
-        plt.style.use("ggplot")
-        plt.plot(df["Частота"], df["Напряжение"])
-        plt.xlabel('Частота, Мгц')
-        plt.ylabel('Напряжение, В')
-        for spine in plt.gca().spines.values():
-            spine.set_color('black')
-            spine.set_linewidth(1.5)
-        plt.gca().set_facecolor('white')
-        plt.grid(color='gray', alpha=0.7, linestyle='--')
-        plt.savefig(f"{self.path_to_png}_FV.png", dpi=600)
-
-        plt.plot(df["Частота"], df["Чувствительность"])
-        plt.xlabel('Частота, Мгц')
-        plt.ylabel('Чувствительность, Дб')
-        for spine in plt.gca().spines.values():
-            spine.set_color('black')
-            spine.set_linewidth(1.5)
-        plt.gca().set_facecolor('white')
-        plt.grid(color='gray', alpha=0.7, linestyle='--')
-        plt.savefig(f"{self.path_to_png}_FL.png", dpi=600)
+        """Поставить в очередь экспорта графики напряжения и чувствительности"""
+        columns = self.store.arrays()
+        # Точки адаптивной сетки измеряются не по порядку частот
+        order = np.argsort(columns["Частота"], kind="stable")
+        x = columns["Частота"][order]
+        figures = [(x, columns["Напряжение"][order], 'Частота, Мгц', 'Напряжение, В', f"{self.path_to_png}_FV.png"),
+                   (x, columns["Чувствительность"][order], 'Частота, Мгц', 'Чувствительность, Дб',
+                    f"{self.path_to_png}_FL.png")]
+        return export.submit(f"Графики {self.path_to_png}", export.write_figures, figures,
+                             background=self.background)
 
-        logging.info(f"Графики сохранены в {self.path_to_png}")
+    def save_summary(self, summary):
+        """Сохранить сводную таблицу (DataFrame) повторных измерений и поставить в очередь графики среднего"""
+        self.summary = summary
+        summary.to_csv(f"{self.path_to_csv}_summary.csv", index=False)
+        logging.info(f"Сводка повторных измерений сохранена в {self.path_to_csv}_summary.csv")
+        x = summary["Частота"].to_numpy()
+        figures = [(x, summary[f"{name}_среднее"].to_numpy(), summary[f"{name}_СКО"].to_numpy(),
+                    summary[f"{name}_мин"].to_numpy(), summary[f"{name}_макс"].to_numpy(),
+                    'Частота, Мгц', ylabel, f"{self.path_to_png}_{suffix}.png")
+                   for name, ylabel, suffix in (("Напряжение", 'Напряжение, В', "FV"),
+                                                ("Чувствительность", 'Чувствительность, Дб', "FL"))]
+        return export.submit(f"Графики {self.path_to_png}", export.write_band_figures, figures,
+                             background=self.background)
 
     def csv_to_excel(self):
-        df = pd.read_csv(f"{self.path_to_csv}.csv")
-        df.to_excel(f"{self.path_to_csv}.xlsx", index=False)
-
-    def init_plot(self):
-        self.fig, self.ax = plt.subplots()
-        self.x_data = []
-        self.y_data = []
-        self.line, = self.ax.plot([], [])
-        plt.ion()
-        plt.show()
-
-        for spine in self.ax.spines.values():
-            spine.set_color('black')
-            spine.set_linewidth(1.5)
-        self.ax.set_xlabel('Частота, Мгц')
-        self.ax.set_ylabel('Чувствительность, Дб')
-        self.ax.set_facecolor('white')
-        self.ax.grid(color='gray', alpha=0.7, linestyle='--')
+        """Поставить в очередь экспорта таблицу Excel (сводка и все измерения)"""
+        if not self.excel:
+            return None
+        sheets = {}
+        if self.summary is not None:
+            sheets["Сводка"] = {column: self.summary[column].to_numpy() for column in self.summary.columns}
+        sheets["Измерения"] = {column: values.copy() for column, values in self.store.arrays().items()}
+        return export.submit(f"Таблица {self.path_to_csv}.xlsx", export.write_excel, f"{self.path_to_csv}.xlsx",
+                             sheets, background=self.background)
+
+    def save(self):
+        """Сохранить результаты и метаданные в .npz"""
+        self.store.save(f"{self.path_to_csv}.npz", self.metadata)
+        logging.info(f"Результаты сохранены в {self.path_to_csv}.npz")
+
+    def close(self):
+        """Сохранить .npz, закрыть CSV и дорисовать график"""
+        self.save()
+        if self.sink is not None:
+            self.sink.close()
+        self.plot.redraw()
+
+    def init_plot(self, capacity: int = 1024, max_fps: float = 5, headless: bool = False, sort: bool = False):
+        self.plot = LivePlot(capacity, max_fps, headless, sort)
 
     def update_plot(self, x, y):
-        self.x_data.append(x)
-        self.y_data.append(y)
-        self.line.set_xdata(self.x_data)
-        self.line.set_ydata(self.y_data)
-        self.ax.relim()
-        self.ax.autoscale_view()
-        self.fig.canvas.draw()
-        self.fig.canvas.flush_events()
+        self.plot.append(x, y)
 
 
 class PowerLimiter:
-    def __init__(self, center_freq, min_freq, max_freq):
-        self.__min_limitation = {
-            (min_freq, center_freq - 8): -10,
-            (center_freq - 8, center_freq + 8): -70,
-            (center_freq + 8, max_freq): 0
-        }
-        self.__max_limitation = {
-            (min_freq, center_freq - 8): 0,
-            (center_freq - 8, center_freq - 6): -10,
-            (center_freq - 6, center_freq + 6): -40,
-            (center_freq + 6, center_freq + 8): -10,
-            (center_freq + 8, max_freq): 0
-        }
+    """
+    Окна допустимых уровней генератора [Дб] в зависимости от частоты.
+
+    Окно задается границами участков относительно центральной частоты
+    (edges, [Мгц]) и уровнем на каждом участке (levels, на один больше
+    границ). Граница относится к участку слева от нее
+    """
+
+    def __init__(self, center_freq, min_freq, max_freq,
+                 min_edges=(-8, 8), min_levels=(-10, -70, 0),
+                 max_edges=(-8, -6, 6, 8), max_levels=(0, -10, -40, -10, 0)):
+        self.min_freq = min_freq
+        self.max_freq = max_freq
+        self.__min_edges = center_freq + np.atleast_1d(np.asarray(min_edges, dtype=float))
+        self.__min_levels = np.atleast_1d(np.asarray(min_levels))
+        self.__max_edges = center_freq + np.atleast_1d(np.asarray(max_edges, dtype=float))
+        self.__max_levels = np.atleast_1d(np.asarray(max_levels))
+        for edges, levels in ((self.__min_edges, self.__min_levels), (self.__max_edges, self.__max_levels)):
+            if levels.shape[0] != edges.shape[0] + 1 or np.any(np.diff(edges) <= 0):
+                logging.error("Окно уровней задано неверно")
+                raise ValueError("Окно уровней задано неверно")
 
     def get_max_limit(self, freq):
-        for freq_range, value in self.__max_limitation.items():
-            if freq_range[0] <= freq <= freq_range[1]:
-                return value
-        logging.error("Частота не удовлетворяет ни одному диапазону значений")
-        return None
+        return self.__lookup(self.__max_edges, self.__max_levels, freq)
 
     def get_min_limit(self, freq):
-        for freq_range, value in self.__min_limitation.items():
-            if freq_range[0] <= freq <= freq_range[1]:
-                return value
-        logging.error("Частота не удовлетворяет ни одному диапазону значений")
-        return None
+        return self.__lookup(self.__min_edges, self.__min_levels, freq)
+
+    def get_limits(self, array_freq):
+        """
+        Минимальные и максимальные уровни сразу для всего массива частот.
+        Для частот вне диапазона возвращается NaN
+        """
+        array_freq = np.asarray(array_freq, dtype=float)
+        outside = (array_freq < self.min_freq) | (array_freq > self.max_freq)
+        if np.any(outside):
+            logging.error(f"{np.count_nonzero(outside)} частот не удовлетворяют ни одному диапазону значений")
+        min_limits = self.__min_levels[np.searchsorted(self.__min_edges, array_freq)].astype(float)
+        max_limits = self.__max_levels[np.searchsorted(self.__max_edges, array_freq)].astype(float)
+        min_limits[outside] = np.nan
+        max_limits[outside] = np.nan
+        return min_limits, max_limits
+
+    def __lookup(self, edges, levels, freq):
+        if not self.min_freq <= freq <= self.max_freq:
+            logging.error("Частота не удовлетворяет ни одному диапазону значений")
+            return None
+        return levels[np.searchsorted(edges, freq)].item()
 
 
 class Calculation:
-    def __init__(self, osc, gen, db_step, window):
+    def __init__(self, osc, gen, db_step, window, strategy=None, settling=None, reading=None):
         self.center_voltage = None
         self.osc = osc
         self.gen = gen
         self.db_step = db_step
         self.window = window
+        self.strategy = strategy if strategy is not None else LinearSearch(resolution=db_step)
+        self.settling = settling if settling is not None else SettlingDetector(osc, min_wait=0.3, max_wait=0.3)
+        self.reading = reading if reading is not None else RepeatedReading(osc, max_samples=1)
+        # Суммарное время установления за последний поиск уровня [с]
+        self.settle_time = 0
+        # Уровень, найденный на предыдущей частоте - подсказка для следующего поиска
+        self.hint = None
+
+    def probe(self, db):
+        """Установить уровень и измерить напряжение и PKP"""
+        self.gen.set_level(db)
+        data, settle_time = self.settling.wait()
+        self.settle_time += settle_time
+        return self.reading.measure(data)
+
+    def limits(self, freq_current):
+        """Окно (min, max) уровней для freq_current"""
+        return self.window.get_min_limit(freq_current), self.window.get_max_limit(freq_current)
+
+    def search_optimal_level(self, freq_current, flag=False, limits=None, seed=None):
+        """
+        Поиск уровня, при котором напряжение ближе всего к 1 В.
+        limits - заранее рассчитанные (min, max) уровни окна для freq_current,
+        seed - уровень из кеша калибровки, с которого начинается поиск
+        """
+        self.settle_time = 0
+        db_min, db_max = limits or self.limits(freq_current)
+        voltage, pkp, db = self.strategy.search(self.probe, db_min, db_max, self.hint, seed)
+        logging.debug(f"Частота {freq_current}Мгц: {len(self.strategy.probes)} шагов генератора "
+                      f"({self.strategy.name})")
+        if flag:
+            self.center_voltage = voltage
+        else:
+            self.hint = db
+        return voltage, pkp, db
 
-    def search_optimal_level(self, freq_current, flag=False):
-
-        voltage_last = 1000
-        volt_list = []
-        result_list = []
-
-        for db_current in range(self.window.get_min_limit(freq_current),
-                                self.window.get_max_limit(freq_current) + 1,
-                                self.db_step):
-            self.gen.set_level(db_current)
-            time.sleep(0.3)
-            data = self.osc.get_all()
-            voltage_current = self.osc.convert_voltage(data["AVERage"])
-            pkp_current = self.osc.convert_voltage(data["PKPK"])
-
-            if voltage_current < 0.85 or db_current == self.window.get_max_limit(freq_current):
-                volt_list = [abs(x - 1) for x in volt_list]
-                min_index = volt_list.index(min(volt_list))
-                if flag:
-                    self.center_voltage = voltage_last
-                return result_list[min_index]
-
-            else:
-                volt_list.append(voltage_current)
-                result_list.append((voltage_current, pkp_current, db_current))
+    def start_level(self, limits, seed=None):
+        """Уровень первого шага поиска в окне limits = (min, max)"""
+        return self.strategy.start_level(limits[0], limits[1], self.hint, seed)
 
     def calculate_l(self, voltage, db):
         """Расчет чувствительности"""
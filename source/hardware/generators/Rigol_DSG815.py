@@ -1,36 +1,54 @@
 import logging
 import time
 
-from source.interfaces import Generator, scan_instr
+from source.interfaces import Generator, find_instr
 
 
 class RigolDSG815(Generator):
-    def __init__(self, ip: str | None = None, level: int = -70, freq: int = 1160):
+    def __init__(self, ip: str | None = None, level: int = -70, freq: int = 1160, network: dict | None = None,
+                 vxi11_port: int | None = None, reset: bool = False):
         if not ip:
-            ip = scan_instr("Rigol")
+            ip = find_instr("Rigol", **(network or {}))
             if not ip:
                 logging.error("IP адрес задан неверно")
                 raise TypeError("IP адрес задан неверно")
             else:
                 logging.info(f"Rigol найден на {ip}")
 
-        super().__init__(ip)
-        self.set_factory_settings()
-        self.level: int = level
-        self.freq: int | float = freq
-        self.resource.write(f":LEV {self.level}")
-        self.resource.write(f":FREQ {self.freq * 1000}KHz")
+        super().__init__(ip, vxi11_port=vxi11_port)
+        # Кеш состояния прибора: None - состояние неизвестно
+        self.level: int | None = None
+        self.freq: int | float | None = None
+        # Сброс к заводским настройкам (2 с) - только по явному запросу
+        if reset:
+            self.set_factory_settings()
+        else:
+            self.out_off()
+        self.configure(freq=freq, level=level)
         logging.info("Инициализация Rigol успешно завершена")
 
     def set_level(self, level: int):
         """Установить амплитуду радиочастотного сигнала."""
-        self.level = level
-        self.resource.write(f":LEV {self.level}")
+        self.configure(level=level)
 
     def set_freq(self, freq: int | float):
         """Установить частоту радиочастотного сигнала"""
-        self.freq = freq
-        self.resource.write(f":FREQ {int(self.freq * 1000)}KHz")
+        self.configure(freq=freq)
+
+    def configure(self, freq: int | float | None = None, level: int | None = None):
+        """
+        Установить частоту и амплитуду одним сообщением SCPI.
+        Команды, не меняющие состояние прибора, не отправляются
+        """
+        commands = []
+        if freq is not None and (self.freq is None or round(freq * 1000) != round(self.freq * 1000)):
+            self.freq = freq
+            commands.append(f":FREQ {round(self.freq * 1000)}KHz")
+        if level is not None and level != self.level:
+            self.level = level
+            commands.append(f":LEV {self.level}")
+        if commands:
+            self.resource.write(";".join(commands))
 
     def out_on(self):
         """Включить радиочастотный выход"""
@@ -42,6 +60,30 @@ class RigolDSG815(Generator):
         self.resource.write(":OUTP OFF")
         logging.info("Выключен радиочастотный выход Rigol")
 
+    def load_sweep(self, freqs, levels, dwell: float, trigger: str = "dwell"):
+        """
+        Загрузить таблицу list-свипа одним сообщением SCPI.
+        trigger - переход к следующей точке: dwell - по истечении dwell [с], bus - по *TRG
+        """
+        rows = [f":SWE:LIST:INS {round(freq * 1000)}KHz,{level:g},{dwell:g}" for freq, level in zip(freqs, levels)]
+        self.resource.write(";".join([":SWE:STAT OFF", ":SWE:TYPE LIST", ":SWE:MODE SING", ":SWE:LIST:DEL:ALL",
+                                      *rows, f":SWE:POIN:TRIG:TYPE {'BUS' if trigger == 'bus' else 'AUTO'}"]))
+
+    def start_sweep(self):
+        """Запустить свип по частоте и уровню с первой точки таблицы"""
+        # Частоту и уровень меняет свип
+        self.level = None
+        self.freq = None
+        self.resource.write(":SWE:STAT LEV,FREQ;:SWE:EXEC")
+
+    def trigger(self):
+        """Перейти к следующей точке свипа (trigger=bus)"""
+        self.resource.write("*TRG")
+
+    def stop_sweep(self):
+        """Остановить свип, генератор остается на текущей точке"""
+        self.resource.write(":SWE:STAT OFF")
+
     def disconnect(self):
         """Закрыть соединение с Rigol"""
         self.out_off()
@@ -55,6 +97,8 @@ class RigolDSG815(Generator):
         — Восстановить заводские настройки ИМЕНИ хоста, IP-адреса и пароля в LXI.
         """
         self.resource.write(":SYST:PRES:TYPE FACtory")
+        self.level = None
+        self.freq = None
         time.sleep(2)
         logging.info("Сброс Rigol к заводским настройкам успешно произведен")
         self.out_off()
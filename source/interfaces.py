@@ -1,8 +1,13 @@
+import errno
 import logging
 import re
+import selectors
 import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-import pyvisa
+from source.cache import AddressCache
 
 
 def check_ip_address(ip):
@@ -17,29 +22,238 @@ def check_ip_address(ip):
         return False
 
 
-def scan_instr(instr_name: str):
-    """Поиск ip оборудования"""
-    rm = pyvisa.ResourceManager()
-    for i in range(100, 255):
-        ip = f"192.168.1.{i}"
+def probe_ports(hosts: list, ports: list, timeout: float = 0.5):
+    """
+    Проверка доступности TCP-портов неблокирующими connect сразу ко всем адресам.
+    Возвращает адреса, на которых открыт хотя бы один порт, в исходном порядке
+    """
+    selector = selectors.DefaultSelector()
+    for host in hosts:
+        for port in ports:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            if sock.connect_ex((host, port)) in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+                selector.register(sock, selectors.EVENT_WRITE, host)
+            else:
+                sock.close()
+
+    alive = set()
+    deadline = time.monotonic() + timeout
+    while selector.get_map() and time.monotonic() < deadline:
+        for key, _ in selector.select(deadline - time.monotonic()):
+            if key.fileobj.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                alive.add(key.data)
+            selector.unregister(key.fileobj)
+            key.fileobj.close()
+
+    for key in list(selector.get_map().values()):
+        key.fileobj.close()
+    selector.close()
+    return [host for host in hosts if host in alive]
+
+
+_resource_manager = None
+_resource_manager_lock = threading.Lock()
+
+
+def resource_manager():
+    """
+    Общий для процесса pyvisa.ResourceManager.
+    pyvisa импортируется при первом обращении: это заметная часть времени запуска
+    """
+    global _resource_manager
+    with _resource_manager_lock:
+        if _resource_manager is None:
+            import pyvisa
+
+            _resource_manager = pyvisa.ResourceManager()
+        return _resource_manager
+
+
+def query_idn(rm, ip: str, timeout: float = 1.0):
+    """Запрос *IDN? по VXI-11, None при ошибке связи"""
+    import pyvisa
+
+    try:
+        instrument = rm.open_resource(f"TCPIP::{ip}::INSTR", open_timeout=int(timeout * 1000))
         try:
-            socket.inet_aton(ip)
-            try:
-                instrument = rm.open_resource(f"TCPIP::{ip}::INSTR")
-                idn_response = instrument.query("*IDN?")
-                if instr_name in idn_response:
-                    rm.close()
-                    return ip
-            except pyvisa.errors.VisaIOError:
+            instrument.timeout = int(timeout * 1000)
+            return instrument.query("*IDN?")
+        finally:
+            instrument.close()
+    except (pyvisa.errors.VisaIOError, OSError):
+        return None
+
+
+def scan_instr(instr_name: str,
+               subnet: str = "192.168.1",
+               first: int = 100,
+               last: int = 254,
+               ports: int | list = (111, 5025),
+               workers: int = 16,
+               timeout: float = 0.5):
+    """
+    Поиск ip оборудования.
+    Сначала отбираются адреса с открытым портом VXI-11 (111) или SCPI (5025),
+    затем *IDN? отправляется им параллельно, не более workers запросов сразу.
+    Возвращает первый адрес, в ответе которого есть instr_name
+    """
+    hosts = [f"{subnet}.{i}" for i in range(first, last + 1)]
+    hosts = [ip for ip in hosts if check_ip_address(ip)]
+    alive = probe_ports(hosts, [ports] if isinstance(ports, int) else ports, timeout)
+    logging.info(f"Поиск {instr_name}: отвечают {len(alive)} из {len(hosts)} адресов {subnet}.{first}-{last}")
+    if not alive:
+        return None
+
+    rm = resource_manager()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {executor.submit(query_idn, rm, ip, 2 * timeout): ip for ip in alive}
+        for future in as_completed(futures):
+            idn_response = future.result()
+            if idn_response and instr_name in idn_response:
+                return futures[future]
+        return None
+    finally:
+        # Новые запросы не запускаются, выполняющиеся ограничены таймаутом
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def idn_serial(idn_response: str):
+    """Серийный номер из ответа *IDN? (производитель,модель,серийный номер,прошивка)"""
+    fields = idn_response.split(",")
+    return fields[2].strip() if len(fields) > 2 else None
+
+
+def find_instr(instr_name: str, cache: AddressCache | None = None, cache_ttl: float = 7 * 24 * 3600,
+               timeout: float = 0.5, **network):
+    """
+    Поиск ip оборудования с использованием кеша адресов.
+    Адрес из кеша проверяется одним коротким *IDN?; если прибор не ответил,
+    ответил не тот прибор или сменился серийный номер - запись удаляется
+    и выполняется полный поиск scan_instr
+    """
+    cache = cache or AddressCache(ttl=cache_ttl)
+    entry = cache.get(instr_name)
+    if entry is not None:
+        idn_response = query_idn(resource_manager(), entry["ip"], timeout)
+        if idn_response and instr_name in idn_response and idn_serial(idn_response) == entry["serial"]:
+            return entry["ip"]
+        logging.warning(f"{instr_name} не подтвержден по адресу {entry['ip']} из кеша, выполняется поиск в сети")
+        cache.invalidate(instr_name)
+
+    ip = scan_instr(instr_name, timeout=timeout, **network)
+    if ip:
+        idn_response = query_idn(resource_manager(), ip, 2 * timeout)
+        cache.put(instr_name, ip, idn_serial(idn_response) if idn_response else None)
+    return ip
+
+
+class SocketReader:
+    """
+    Буферизованное чтение ответов прибора из TCP-сокета.
+
+    Данные читаются через recv_into в один переиспользуемый буфер и
+    накапливаются, пока не придет целое сообщение: строка до символа
+    окончания или JSON-объект со сбалансированными скобками. Перед каждым
+    запросом остатки предыдущих ответов отбрасываются. Ожидание ответа
+    ограничено timeout секунд (TimeoutError)
+    """
+
+    def __init__(self, sock: socket.socket, timeout: float = 2.0, buffer_size: int = 4096,
+                 termination: bytes = b"\n", encoding: str = "latin1"):
+        self.sock = sock
+        self.timeout = timeout
+        self.termination = termination
+        self.encoding = encoding
+        self.__buffer = bytearray(buffer_size)
+        self.__view = memoryview(self.__buffer)
+        self.__data = bytearray()
+
+    def query(self, command: str, json_reply: bool = False):
+        """Отправить команду и прочитать ответ (строку или JSON-объект)"""
+        self.discard()
+        self.sock.sendall(f"{command}\n".encode())
+        return self.read_json() if json_reply else self.read_line()
+
+    def read_line(self):
+        """Строка ответа вместе с символом окончания"""
+        deadline = time.monotonic() + self.timeout
+        position = 0
+        while True:
+            end = self.__data.find(self.termination, position)
+            if end >= 0:
+                end += len(self.termination)
+                message = bytes(self.__data[:end])
+                del self.__data[:end]
+                return message.decode(self.encoding)
+            position = max(len(self.__data) - len(self.termination) + 1, 0)
+            self.__fill(deadline)
+
+    def read_json(self):
+        """JSON-объект от первой "{" до парной ей "}" (скобки внутри строк не учитываются)"""
+        deadline = time.monotonic() + self.timeout
+        position, start, depth = 0, None, 0
+        in_string, escape = False, False
+        while True:
+            data = self.__data
+            while position < len(data):
+                char = data[position]
+                if start is None:
+                    if char == 0x7B:
+                        start, depth = position, 1
+                elif in_string:
+                    if escape:
+                        escape = False
+                    elif char == 0x5C:
+                        escape = True
+                    elif char == 0x22:
+                        in_string = False
+                elif char == 0x22:
+                    in_string = True
+                elif char == 0x7B:
+                    depth += 1
+                elif char == 0x7D:
+                    depth -= 1
+                    if depth == 0:
+                        message = bytes(data[start:position + 1])
+                        del data[:position + 1]
+                        # Символ окончания после объекта относится к этому же ответу
+                        while data[:1].isspace():
+                            del data[:1]
+                        return message.decode(self.encoding)
+                position += 1
+            self.__fill(deadline)
+
+    def discard(self):
+        """Отбросить накопленные и уже пришедшие в сокет данные"""
+        self.__data.clear()
+        self.sock.setblocking(False)
+        try:
+            while self.sock.recv_into(self.__buffer):
                 pass
-        except socket.error:
+        except (BlockingIOError, InterruptedError):
             pass
+        finally:
+            self.sock.settimeout(self.timeout)
 
-    rm.close()
+    def __fill(self, deadline: float):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Нет ответа прибора за {self.timeout}с")
+        self.sock.settimeout(remaining)
+        try:
+            size = self.sock.recv_into(self.__buffer)
+        except socket.timeout:
+            raise TimeoutError(f"Нет ответа прибора за {self.timeout}с") from None
+        if not size:
+            raise ConnectionError("Соединение закрыто прибором")
+        self.__data += self.__view[:size]
 
 
 class BaseInterface(object):
-    def __init__(self, ip: str, port: int | None = None, type_instr: str | None = None):
+    def __init__(self, ip: str, port: int | None = None, type_instr: str | None = None, timeout: float = 2.0,
+                 vxi11_port: int | None = None):
 
         if type_instr == "gen":
             self.string = "генератор"
@@ -52,12 +266,18 @@ class BaseInterface(object):
             logging.error(f"IP адрес - {ip} задан неверно")
             raise TypeError(f"IP адрес - {ip} задан неверно")
 
+        # Ответ *IDN? (модель, серийный номер, прошивка)
+        self.idn = None
+        self.closed = False
         if port is None:
-            address = "TCPIP0::" + ip + "::INSTR"
+            import pyvisa
+
+            # С явным портом VXI-11 pyvisa не обращается к portmapper (например, для имитатора)
+            address = "TCPIP0::" + ip + (f",{vxi11_port}" if vxi11_port else "") + "::INSTR"
             try:
-                rm = pyvisa.ResourceManager()
-                self.resource = rm.open_resource(address)
+                self.resource = resource_manager().open_resource(address)
                 idn_response = self.resource.query("*IDN?")
+                self.idn = idn_response.strip() or None
                 if idn_response:
                     logging.info(f"Подключение к {self.string}у успешно завершено\n{idn_response}")
                 else:
@@ -65,13 +285,16 @@ class BaseInterface(object):
             except pyvisa.errors.VisaIOError:
                 logging.error(f"Ошибка при подключении к {self.string}у")
             self.sock = None
+            self.reader = None
 
         else:
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.reader = SocketReader(self.sock, timeout)
             try:
+                self.sock.settimeout(timeout)
                 self.sock.connect((ip, port))
-                self.sock.send("*IDN?\n".encode())
-                data = self.sock.recv(1024).decode()
+                data = self.reader.query("*IDN?")
+                self.idn = data.strip() or None
                 if data:
                     logging.info(f"Подключение к {self.string}у успешно завершено\n{data}")
                 else:
@@ -86,6 +309,7 @@ class BaseInterface(object):
 
     def disconnect(self):
         """Закрыть соединение с прибором"""
+        self.closed = True
         if self.resource:
             self.resource.close()
             logging.info(f"Соединение с {self.string}ом закрыто")
@@ -106,8 +330,8 @@ class BaseInterface(object):
 
 
 class Oscilloscope(BaseInterface):
-    def __init__(self, ip: str, port: int | None = None):
-        super().__init__(ip, port, "osc")
+    def __init__(self, ip: str, port: int | None = None, timeout: float = 2.0):
+        super().__init__(ip, port, "osc", timeout)
 
     def get_all(self):
         """Получить все измеренные значения"""
@@ -131,8 +355,8 @@ class Oscilloscope(BaseInterface):
 
 
 class Generator(BaseInterface):
-    def __init__(self, ip: str, port: int | None = None):
-        super().__init__(ip, port, "gen")
+    def __init__(self, ip: str, port: int | None = None, vxi11_port: int | None = None):
+        super().__init__(ip, port, "gen", vxi11_port=vxi11_port)
 
     def set_level(self, level: int):
         """Установить амплитуду радиочастотного сигнала."""
@@ -142,6 +366,13 @@ class Generator(BaseInterface):
         """Установить частоту радиочастотного сигнала"""
         pass
 
+    def configure(self, freq: int | float | None = None, level: int | None = None):
+        """Установить частоту и амплитуду радиочастотного сигнала"""
+        if freq is not None:
+            self.set_freq(freq)
+        if level is not None:
+            self.set_level(level)
+
     def out_on(self):
         """Включить радиочастотный выход."""
         pass
@@ -149,3 +380,19 @@ class Generator(BaseInterface):
     def out_off(self):
         """Выключить радиочастотный выход."""
         pass
+
+    def load_sweep(self, freqs, levels, dwell: float, trigger: str = "dwell"):
+        """Загрузить таблицу list-свипа (частоты [Мгц], уровни [Дб], время точки [с])"""
+        pass
+
+    def start_sweep(self):
+        """Запустить свип с первой точки таблицы"""
+        pass
+
+    def trigger(self):
+        """Перейти к следующей точке свипа"""
+        pass
+
+    def stop_sweep(self):
+        """Остановить свип"""
+        pass
@@ -0,0 +1,110 @@
+import datetime
+import glob
+import json
+import logging
+import os
+
+
+class Journal:
+    """
+    Журнал измерений для продолжения эксперимента после сбоя.
+
+    Каждая запись - отдельная строка JSON, сбрасываемая на диск сразу
+    после выполнения измерения. Журнал хранит заголовок (эксперимент,
+    параметры из config.ini, имя РЭМа), калибровку на центральной частоте
+    и все завершенные точки. Недописанная при сбое последняя строка
+    при чтении пропускается.
+    """
+
+    EXTENSION = ".journal"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.header = {}
+        self.center = None
+        self.points = {}
+        if os.path.exists(path):
+            self.__load()
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.__file = open(path, "a", encoding="utf-8")
+        if self.__file.tell() and not self.__ends_with_newline():
+            # Строка, оборванная при сбое, не должна склеиться со следующей записью
+            self.__file.write("\n")
+
+    @classmethod
+    def create(cls, exp_name: str, experiment: str, variables: list, directory: str = "data"):
+        """
+        Новый журнал рядом с таблицами результатов в data/<дата>/.
+        Имя содержит эксперимент, поэтому эксперименты, начатые в одну секунду,
+        не пишут в один журнал; существующий журнал не дописывается
+        """
+        base = (f"{directory}/"
+                f"{datetime.date.today().strftime('%d.%m.%Y')}/"
+                f"{exp_name}_{experiment}_"
+                f"({datetime.datetime.now().strftime('%Hh_%Mm_%Ss')})")
+        path, number = f"{base}{cls.EXTENSION}", 1
+        while os.path.exists(path):
+            number += 1
+            path = f"{base}_{number}{cls.EXTENSION}"
+        journal = cls(path)
+        journal.write("header", experiment=experiment, variables=variables, exp_name=exp_name)
+        return journal
+
+    @classmethod
+    def latest(cls, directory: str = "data"):
+        """Путь к последнему измененному журналу"""
+        paths = glob.glob(os.path.join(directory, "**", f"*{cls.EXTENSION}"), recursive=True)
+        if not paths:
+            logging.error(f"В {directory} не найдено ни одного журнала измерений")
+            raise FileNotFoundError(f"В {directory} не найдено ни одного журнала измерений")
+        return max(paths, key=os.path.getmtime)
+
+    def write(self, record_type: str, **record):
+        """Записать событие в журнал и сбросить его на диск"""
+        record["type"] = record_type
+        self.__apply(record)
+        self.__file.write(json.dumps(record, ensure_ascii=False, default=float) + "\n")
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+
+    def add_center(self, voltage, pkp, db, settle=0):
+        """Записать калибровку на центральной частоте"""
+        self.write("center", voltage=voltage, pkp=pkp, db=db, settle=settle)
+
+    def add_point(self, index: int, freq, level, voltage, pkp, sensitivity, settle=0, run: int = 1):
+        """Записать завершенную точку"""
+        self.write("point", run=run, index=index, freq=freq, level=level, voltage=voltage, pkp=pkp,
+                   sensitivity=sensitivity, settle=settle)
+
+    def point(self, index: int, run: int = 1):
+        """Сохраненная точка или None, если она еще не измерена"""
+        return self.points.get((run, index))
+
+    def close(self):
+        if not self.__file.closed:
+            self.__file.close()
+
+    def __apply(self, record: dict):
+        if record["type"] == "header":
+            self.header = record
+        elif record["type"] == "center":
+            self.center = record
+        elif record["type"] == "point":
+            self.points[(record["run"], record["index"])] = record
+
+    def __ends_with_newline(self):
+        with open(self.path, "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b"\n"
+
+    def __load(self):
+        with open(self.path, encoding="utf-8", errors="replace") as file:
+            for number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    self.__apply(json.loads(line))
+                except (ValueError, KeyError):
+                    logging.warning(f"Пропущена поврежденная строка {number} журнала {self.path}")
+        logging.info(f"Журнал {self.path} загружен: {len(self.points)} точек")
@@ -1,6 +1,11 @@
+import atexit
 import datetime
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+import time
 
 
 class ConsoleColors:
@@ -15,8 +20,99 @@ class ConsoleColors:
     RESET = '\033[0m'
 
 
-def setup_logging():
-    """Создаем функцию инициализирующую логгер"""
+# Стенд, который обслуживает текущий поток (задается в set_station)
+_local = threading.local()
+
+
+def set_station(name: str | None):
+    """Подписывать сообщения текущего потока именем стенда name (None - без подписи)"""
+    _local.station = name
+
+
+class StationFilter(logging.Filter):
+    """
+    Подпись сообщений именем стенда из set_station. Фильтр стоит на
+    RecordQueueHandler и выполняется в потоке, создавшем запись; остальные
+    потоки (главный, обратные вызовы экспорта) сообщения не подписывают
+    """
+
+    def filter(self, record):
+        station = getattr(_local, "station", None)
+        record.station = f"[{station}] " if station else ""
+        return True
+
+
+class RecordQueueHandler(logging.handlers.QueueHandler):
+    """
+    Постановка записи в очередь без форматирования.
+    Сообщение форматируется обработчиками в потоке QueueListener,
+    поэтому вызов logging в цикле измерений не выполняет ввод-вывод
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class BatchFileHandler(logging.FileHandler):
+    """
+    Запись в файл с пакетным сбросом на диск: не чаще раза в flush_interval
+    секунд или каждые batch_size записей. WARNING и выше сбрасываются сразу
+    """
+
+    def __init__(self, filename, batch_size: int = 100, flush_interval: float = 1.0, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.__pending = 0
+        self.__last_flush = time.monotonic()
+
+    def emit(self, record):
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+            self.__pending += 1
+            if (record.levelno >= logging.WARNING or self.__pending >= self.batch_size
+                    or time.monotonic() - self.__last_flush >= self.flush_interval):
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        super().flush()
+        self.__pending = 0
+        self.__last_flush = time.monotonic()
+
+
+# Очередь и фоновый поток записи логов (создаются в setup_logging)
+_queue = None
+_listener = None
+
+
+def flush_logging():
+    """Дождаться вывода всех поставленных в очередь сообщений (например, перед input())"""
+    if _queue is not None and _listener is not None:
+        _queue.join()
+
+
+def stop_logging():
+    """Вывести оставшиеся сообщения и остановить поток записи"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        for handler in logging.getLogger().handlers:
+            if isinstance(handler, RecordQueueHandler):
+                logging.getLogger().removeHandler(handler)
+
+
+def setup_logging(batch: bool = True, batch_size: int = 100, flush_interval: float = 1.0):
+    """
+    Создаем функцию инициализирующую логгер.
+    Логгер только ставит записи в очередь, файл и консоль обслуживает
+    QueueListener в отдельном потоке. batch - пакетная запись файла лога
+    """
+    global _queue, _listener
     log_file = (f"cache/"
                 f"{datetime.date.today().strftime('%d.%m.%Y')}/"
                 f"log_{datetime.datetime.now().strftime('%H_%M_%S')}.log")
@@ -34,39 +130,48 @@ def setup_logging():
         def filter(self, record):
             return record.levelno == logging.WARNING
 
-    # Создаем логгер
+    # Создаем логгер. Уровень INFO отсекает DEBUG до создания записи
     logger = logging.getLogger()
-    logger.setLevel(logging.NOTSET)
+    logger.setLevel(logging.INFO)
 
     # Создаем форматтер для логов
-    formatter = logging.Formatter("%(levelname)s\t%(asctime)s\t%(message)s")
+    formatter = logging.Formatter("%(levelname)s\t%(asctime)s\t%(station)s%(message)s")
     # Создаем обработчик для записи в файл
-    file_handler = logging.FileHandler(log_file)
+    if batch:
+        file_handler = BatchFileHandler(log_file, batch_size, flush_interval)
+    else:
+        file_handler = logging.FileHandler(log_file)
     file_handler.setLevel(logging.INFO)
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
 
     # Обработчик для WARNING
     debug_handler = logging.StreamHandler()
     debug_handler.setLevel(logging.WARNING)
-    debug_formatter = logging.Formatter(ConsoleColors.BLUE + "%(levelname)s - %(message)s")
+    debug_formatter = logging.Formatter(ConsoleColors.BLUE + "%(levelname)s - %(station)s%(message)s")
     debug_handler.setFormatter(debug_formatter)
     debug_handler.addFilter(WarningFilter())
-    logger.addHandler(debug_handler)
 
     # Обработчик для INFO
     info_handler = logging.StreamHandler()
     info_handler.setLevel(logging.INFO)
-    info_formatter = logging.Formatter(ConsoleColors.GREEN + "%(levelname)s - %(message)s")
+    info_formatter = logging.Formatter(ConsoleColors.GREEN + "%(levelname)s - %(station)s%(message)s")
     info_handler.setFormatter(info_formatter)
     info_handler.addFilter(InfoFilter())
-    logger.addHandler(info_handler)
 
     # Обработчик для WARNING
     warning_handler = logging.StreamHandler()
     warning_handler.setLevel(logging.ERROR)
-    warning_formatter = logging.Formatter(ConsoleColors.RED + "%(levelname)s - %(message)s")
+    warning_formatter = logging.Formatter(ConsoleColors.RED + "%(levelname)s - %(station)s%(message)s")
     warning_handler.setFormatter(warning_formatter)
-    logger.addHandler(warning_handler)
+
+    stop_logging()
+    _queue = queue.Queue()
+    _listener = logging.handlers.QueueListener(_queue, file_handler, debug_handler, info_handler, warning_handler,
+                                               respect_handler_level=True)
+    queue_handler = RecordQueueHandler(_queue)
+    queue_handler.addFilter(StationFilter())
+    logger.addHandler(queue_handler)
+    _listener.start()
+    atexit.register(stop_logging)
 
     return logger
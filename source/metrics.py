@@ -0,0 +1,132 @@
+import bisect
+import functools
+import logging
+import time
+
+
+class LatencyHistogram:
+    """
+    Гистограмма длительностей операции с логарифмическими корзинами.
+    Соседние границы отличаются в 10^(1/20) раз (~12%), что и определяет
+    точность процентилей. Память не растет с числом измерений
+    """
+
+    BOUNDS = [10 ** (k / 20) for k in range(-120, 61)]  # от 1 мкс до 1000 с
+
+    def __init__(self):
+        self.buckets = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        self.buckets[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float):
+        """Оценка q-го процентиля [с] по верхней границе корзины"""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for index, number in enumerate(self.buckets):
+            seen += number
+            if number and seen >= rank:
+                return min(self.BOUNDS[index], self.max) if index < len(self.BOUNDS) else self.max
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class Instrumentation:
+    """
+    Сбор длительностей вызовов приборов и этапов измерения.
+    Методы объектов (генератора, осциллографа, детектора установления)
+    подменяются на уровне экземпляра обертками, которые пишут время вызова
+    в гистограмму операции "<префикс>.<метод>". Вложенные вызовы с тем же
+    префиксом (set_level драйвера через configure и наоборот) не пишутся:
+    их время уже входит во внешний вызов
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.__wrapped = []
+        # Префиксы, вызов которых сейчас выполняется
+        self.__active = set()
+
+    def record(self, operation: str, seconds: float):
+        histogram = self.histograms.get(operation)
+        if histogram is None:
+            histogram = self.histograms[operation] = LatencyHistogram()
+        histogram.add(seconds)
+
+    def instrument(self, obj, methods, prefix: str):
+        """Обернуть методы obj; отсутствующие методы пропускаются"""
+        for name in methods:
+            method = getattr(obj, name, None)
+            if method is None:
+                continue
+            setattr(obj, name, self.__wrap(prefix, f"{prefix}.{name}", method))
+            self.__wrapped.append((obj, name))
+        return obj
+
+    def restore(self):
+        """Снять обертки"""
+        for obj, name in reversed(self.__wrapped):
+            vars(obj).pop(name, None)
+        self.__wrapped.clear()
+
+    def summary(self):
+        """Строки статистики p50/p95/max по операциям"""
+        lines = [f"{'Операция':<28}{'вызовов':>9}{'сумма, с':>10}{'p50, мс':>10}{'p95, мс':>10}{'max, мс':>10}"]
+        for operation, histogram in sorted(self.histograms.items(), key=lambda item: -item[1].total):
+            lines.append(f"{operation:<28}{histogram.count:>9}{histogram.total:>10.2f}"
+                         f"{histogram.percentile(50) * 1000:>10.1f}{histogram.percentile(95) * 1000:>10.1f}"
+                         f"{histogram.max * 1000:>10.1f}")
+        return lines
+
+    def log_summary(self):
+        if self.histograms:
+            logging.info("Статистика времени выполнения:\n" + "\n".join(self.summary()))
+
+    def __wrap(self, prefix, operation, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if prefix in self.__active:
+                return method(*args, **kwargs)
+            self.__active.add(prefix)
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.record(operation, time.perf_counter() - start)
+                self.__active.discard(prefix)
+        return wrapper
+
+
+class EtaEstimator:
+    """
+    Оценка оставшегося времени по экспоненциально сглаженной стоимости точки.
+    Одна долгая точка (много шагов уровня) сдвигает оценку только на долю alpha
+    """
+
+    def __init__(self, alpha: float = 0.1):
+        self.alpha = alpha
+        self.cost = None
+
+    def update(self, seconds: float):
+        """Учесть длительность очередной измеренной точки"""
+        self.cost = seconds if self.cost is None else self.alpha * seconds + (1 - self.alpha) * self.cost
+
+    def remaining(self, points: int):
+        """Оставшееся время [с] для points точек"""
+        return (self.cost or 0.0) * points
+
+
+def format_duration(seconds: float):
+    seconds = int(seconds)
+    return f"{seconds // 3600}ч {seconds % 3600 // 60}м {seconds % 60}с"
@@ -1,13 +1,27 @@
 import configparser
 import logging
 
+from source.logger import flush_logging
+
 
 def config_pars(path_to_config: str = "config.ini"):
+    """Первый эксперимент из [ExperimentName] и его параметры"""
+    return experiments_pars(path_to_config)[0]
+
+
+def experiments_pars(path_to_config: str = "config.ini"):
+    """
+    Эксперименты из [ExperimentName] (NAME - одно имя или несколько через запятую,
+    выполняются подряд) и параметры каждого: [(exp_name, variables), ...]
+    """
     config = configparser.ConfigParser()
     config.read(path_to_config)
 
-    exp_name = config.get("ExperimentName", "NAME")
+    names = config.get("ExperimentName", "NAME").split(";")[0]
+    return [(exp_name.strip(), experiment_variables(config, exp_name.strip())) for exp_name in names.split(",")]
 
+
+def experiment_variables(config: configparser.ConfigParser, exp_name: str):
     variables = []
     for key in config[exp_name]:
         value_temp = config[exp_name][key].split(";")[0].strip()
@@ -16,7 +30,45 @@ def config_pars(path_to_config: str = "config.ini"):
         else:
             variables.append(int(value_temp))
 
-    return exp_name, variables
+    return variables
+
+
+def parse_value(value: str):
+    """Перевод строкового значения из config.ini в int, float, str или список через запятую"""
+    value = value.split(";")[0].strip()
+    if "," in value:
+        return [parse_value(item) for item in value.split(",")]
+    for value_type in (int, float):
+        try:
+            return value_type(value)
+        except ValueError:
+            pass
+    return value
+
+
+def section_pars(section: str, path_to_config: str = "config.ini"):
+    """Чтение необязательной секции config.ini в словарь параметров"""
+    config = configparser.ConfigParser()
+    config.read(path_to_config)
+
+    if not config.has_section(section):
+        return {}
+    return {key: parse_value(value) for key, value in config[section].items()}
+
+
+def stations_pars(path_to_config: str = "config.ini"):
+    """Параметры измерительных стендов из секций [Station...] config.ini"""
+    config = configparser.ConfigParser()
+    config.read(path_to_config)
+
+    return [(section, section_pars(section, path_to_config))
+            for section in config.sections() if section.startswith("Station")]
+
+
+def ask():
+    """Ввод оператора после вывода всех сообщений из очереди логов (в т.ч. вопроса)"""
+    flush_logging()
+    return input()
 
 
 def name_exp_parse():
@@ -29,12 +81,12 @@ def name_exp_parse():
         2: "без_экрана"
     }
     logging.warning("Введите номер РЭМа")
-    number_rem = input()
+    number_rem = ask()
     logging.warning("Введите cхему РЭМа\n\t1 - С резисторами\n\t2 - Без резисторов")
-    scheme = scheme_dict[int(input())]
+    scheme = scheme_dict[int(ask())]
     logging.warning("Установлен ли экран на РЭМ?\n\t1 - Да\n\t2 - Нет")
-    screen = screen_dict[int(input())]
+    screen = screen_dict[int(ask())]
     logging.warning("Введите версию прошивки")
-    version = input()
+    version = ask()
 
     return f"РЭМ-{number_rem}_{scheme}_{screen}_{version}"
@@ -0,0 +1,125 @@
+import time
+
+import numpy as np
+
+
+class LivePlot:
+    """
+    График чувствительности, обновляемый по ходу эксперимента.
+
+    Точки хранятся в предвыделенных массивах NumPy, на экран выводится не
+    больше двух точек (min/max) на пиксель ширины осей, перерисовывается
+    только линия поверх сохраненного фона (blitting) и не чаще max_fps раз
+    в секунду. Полная перерисовка - только при выходе данных за пределы осей.
+    В режиме headless окно не создается, точки только накапливаются.
+    При sort точки хранятся упорядоченными по x (адаптивная сетка частот,
+    где точки измеряются не по порядку).
+    """
+
+    # Запас при расширении осей, чтобы полная перерисовка была редкой
+    MARGIN = 0.25
+
+    def __init__(self, capacity: int = 1024, max_fps: float = 5, headless: bool = False, sort: bool = False,
+                 xlabel: str = 'Частота, Мгц', ylabel: str = 'Чувствительность, Дб'):
+        self.x_data = np.empty(max(int(capacity), 1))
+        self.y_data = np.empty(max(int(capacity), 1))
+        self.size = 0
+        self.max_fps = max_fps
+        self.headless = bool(headless)
+        self.sort = bool(sort)
+        self.__last_draw = 0
+        self.__dirty = False
+        self.__background = None
+
+        if self.headless:
+            self.fig, self.ax, self.line = None, None, None
+            return
+
+        # pyplot (и backend окна) загружается только при выводе графика на экран
+        from matplotlib import pyplot as plt
+
+        self.fig, self.ax = plt.subplots()
+        self.line, = self.ax.plot([], [], animated=True)
+        for spine in self.ax.spines.values():
+            spine.set_color('black')
+            spine.set_linewidth(1.5)
+        self.ax.set_xlabel(xlabel)
+        self.ax.set_ylabel(ylabel)
+        self.ax.set_facecolor('white')
+        self.ax.grid(color='gray', alpha=0.7, linestyle='--')
+
+        self.fig.canvas.mpl_connect("draw_event", self.__on_draw)
+        plt.ion()
+        plt.show()
+        self.fig.canvas.draw()
+
+    def append(self, x, y):
+        """Добавить точку и, если позволяет частота кадров, перерисовать линию"""
+        if self.size == self.x_data.shape[0]:
+            self.x_data = np.resize(self.x_data, 2 * self.size)
+            self.y_data = np.resize(self.y_data, 2 * self.size)
+        index = self.size
+        if self.sort and self.size and x < self.x_data[self.size - 1]:
+            index = int(np.searchsorted(self.x_data[:self.size], x, side="right"))
+            self.x_data[index + 1:self.size + 1] = self.x_data[index:self.size]
+            self.y_data[index + 1:self.size + 1] = self.y_data[index:self.size]
+        self.x_data[index] = x
+        self.y_data[index] = y
+        self.size += 1
+        self.__dirty = True
+
+        if not self.headless and time.monotonic() - self.__last_draw >= 1 / self.max_fps:
+            self.redraw()
+
+    def redraw(self):
+        """Перерисовать накопленные точки"""
+        if self.headless or not self.__dirty or self.size == 0:
+            return
+        self.__last_draw = time.monotonic()
+        self.__dirty = False
+        self.line.set_data(*self.decimate())
+
+        if self.__rescale() or self.__background is None:
+            # draw_event перехватит новый фон и нарисует линию
+            self.fig.canvas.draw()
+        else:
+            self.fig.canvas.restore_region(self.__background)
+            self.ax.draw_artist(self.line)
+            self.fig.canvas.blit(self.ax.bbox)
+        self.fig.canvas.flush_events()
+
+    def decimate(self):
+        """Прореживание min/max до ширины осей в пикселях"""
+        x = self.x_data[:self.size]
+        y = self.y_data[:self.size]
+        buckets = int(self.ax.bbox.width) if self.ax is not None else 0
+        if buckets < 1 or self.size <= 2 * buckets:
+            return x, y
+
+        width = self.size // buckets
+        body = y[:buckets * width].reshape(buckets, width)
+        offsets = np.arange(buckets) * width
+        index = np.sort(np.concatenate((offsets + body.argmin(axis=1), offsets + body.argmax(axis=1))))
+        index = np.concatenate((index, np.arange(buckets * width, self.size)))
+        return x[index], y[index]
+
+    def __rescale(self):
+        """Расширить пределы осей, если данные вышли за них"""
+        x = self.x_data[:self.size]
+        y = self.y_data[:self.size]
+        x_min, x_max = np.nanmin(x), np.nanmax(x)
+        y_min, y_max = np.nanmin(y), np.nanmax(y)
+        (x_low, x_high), (y_low, y_high) = self.ax.get_xlim(), self.ax.get_ylim()
+        if x_low <= x_min and x_max <= x_high and y_low <= y_min and y_max <= y_high:
+            return False
+
+        x_pad = (x_max - x_min) * self.MARGIN or 1
+        y_pad = (y_max - y_min) * self.MARGIN or 1
+        self.ax.set_xlim(x_min - x_pad, x_max + x_pad)
+        self.ax.set_ylim(y_min - y_pad, y_max + y_pad)
+        return True
+
+    def __on_draw(self, event):
+        """Сохранение фона после полной перерисовки (в т.ч. при изменении размера окна)"""
+        self.__background = self.fig.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.line)
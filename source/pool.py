@@ -0,0 +1,53 @@
+import logging
+import threading
+
+
+class InstrumentPool:
+    """
+    Подключенные приборы процесса.
+
+    Драйвер создается (с подключением и *IDN?) при первом запросе с данными
+    параметрами и выдается повторно следующим экспериментам, пока соединение
+    не закрыто. Подключение выполняется под блокировкой своих параметров,
+    поэтому стенды подключаются к своим приборам одновременно.
+    Все соединения закрываются в close_all() при завершении программы
+    """
+
+    def __init__(self):
+        self.__instruments = {}
+        # Блокировки по параметрам прибора; общая блокировка - только для словарей
+        self.__key_locks = {}
+        self.__lock = threading.Lock()
+
+    def get(self, driver, **params):
+        """Подключенный экземпляр driver(**params)"""
+        key = (driver, repr(sorted(params.items())))
+        with self.__lock:
+            key_lock = self.__key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self.__lock:
+                instrument = self.__instruments.get(key)
+            if instrument is not None and not instrument.closed:
+                logging.info(f"Используется открытое соединение {driver.__name__}")
+                return instrument
+            instrument = driver(**params)
+            with self.__lock:
+                self.__instruments[key] = instrument
+            return instrument
+
+    def close_all(self):
+        """Закрыть все соединения"""
+        with self.__lock:
+            instruments = list(self.__instruments.values())
+            self.__instruments.clear()
+        for instrument in instruments:
+            if instrument.closed:
+                continue
+            try:
+                instrument.disconnect()
+            except Exception:
+                logging.exception(f"Ошибка при закрытии соединения {type(instrument).__name__}")
+
+
+# Пул приборов программы
+instruments = InstrumentPool()
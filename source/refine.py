@@ -0,0 +1,58 @@
+class RefinementPlanner:
+    """
+    Адаптивная сетка частот.
+
+    Сначала измеряются точки грубой сетки с шагом coarse_step [Мгц]; после
+    каждой новой точки грубой сетки интервал до предыдущей рекурсивно делится
+    пополам, пока чувствительность на его концах отличается больше чем на
+    threshold [Дб] и в интервале остаются точки исходной сетки. На плоских
+    участках измеряется только грубая сетка, на участках с резким изменением
+    чувствительности - все точки исходной сетки.
+    Точки выбираются из исходной сетки (индексы array_freq), поэтому журнал,
+    кеш калибровки и окна уровней работают с ними без изменений
+    """
+
+    def __init__(self, num_elements: int, freq_step: float, coarse_step: float = 1.0, threshold: float = 0.5):
+        self.num_elements = num_elements
+        self.stride = max(int(round(coarse_step / freq_step)), 1)
+        self.threshold = threshold
+        coarse = list(range(0, num_elements, self.stride))
+        if coarse and coarse[-1] != num_elements - 1:
+            coarse.append(num_elements - 1)
+        self.coarse = coarse
+        # Выдано точек всего и точек грубой сетки
+        self.planned = 0
+        self.coarse_done = 0
+
+    def indices(self, values):
+        """
+        Генератор индексов точек в порядке измерения (частота в среднем растет).
+        values - массив чувствительности по индексам исходной сетки; значение
+        точки должно быть записано в values до запроса следующего индекса.
+        NaN считается резким изменением
+        """
+        previous = None
+        for index in self.coarse:
+            self.coarse_done += 1
+            yield from self.__yield(index)
+            if previous is not None:
+                yield from self.__refine(values, previous, index)
+            previous = index
+
+    def remaining(self):
+        """Оценка числа оставшихся точек по среднему числу точек на интервал грубой сетки"""
+        if not self.coarse_done:
+            return len(self.coarse)
+        return round((len(self.coarse) - self.coarse_done) * self.planned / self.coarse_done)
+
+    def __refine(self, values, low, high):
+        if high - low < 2 or abs(values[high] - values[low]) <= self.threshold:
+            return
+        middle = (low + high) // 2
+        yield from self.__yield(middle)
+        yield from self.__refine(values, low, middle)
+        yield from self.__refine(values, middle, high)
+
+    def __yield(self, index):
+        self.planned += 1
+        yield index
@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+
+import source.funcs as funcs
+import source.hardware as hardware
+from source.journal import Journal
+from source.logger import set_station
+from source.parsing import name_exp_parse
+from source.pool import instruments
+
+
+class Station:
+    """Измерительный стенд: генератор, осциллограф и испытуемый РЭМ"""
+
+    def __init__(self, name: str, generator_ip: str, oscilloscope_ip: str, oscilloscope_port: int = 3000,
+                 dut: str | None = None):
+        self.name = name
+        self.generator_ip = generator_ip
+        self.oscilloscope_ip = oscilloscope_ip
+        self.oscilloscope_port = oscilloscope_port
+        self.dut = dut
+        self.status = "ожидание"
+        self.elapsed = 0
+
+
+class ExperimentRunner:
+    """
+    Одновременный запуск экспериментов на нескольких стендах.
+
+    Каждый стенд обслуживается своим потоком, имя потока совпадает с именем
+    стенда, сообщения этого потока подписываются именем стенда. Результаты стенда сохраняются
+    в отдельный каталог data/<дата>/<стенд>/, график в реальном времени
+    не выводится (pyplot не потокобезопасен). Несколько экспериментов
+    выполняются на стенде подряд через одни и те же соединения с приборами.
+    """
+
+    def __init__(self, experiments: list, stations: list, reset: bool = False, **options):
+        # [(exp_name, variables), ...]
+        self.experiments = experiments
+        self.stations = stations
+        self.reset = reset
+        self.options = options
+        self.options["plot"] = dict(options.get("plot") or {}, headless=1)
+
+    @classmethod
+    def from_config(cls, experiments: list, stations: list, reset: bool = False, **options):
+        """Создание по спискам из parsing.experiments_pars и parsing.stations_pars"""
+        return cls(experiments, [Station(name, **params) for name, params in stations], reset, **options)
+
+    def run(self):
+        """Запустить эксперимент на всех стендах и дождаться завершения"""
+        for station in self.stations:
+            if not station.dut:
+                logging.warning(f"Параметры РЭМа для стенда {station.name}")
+                station.dut = name_exp_parse()
+
+        threads = [threading.Thread(target=self.__run_station, args=(station,), name=station.name)
+                   for station in self.stations]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for station in self.stations:
+            logging.info(f"Стенд {station.name} ({station.dut}): {station.status}, "
+                         f"время {int(station.elapsed // 60)}м {int(station.elapsed % 60)}с")
+        return all(station.status == "завершен" for station in self.stations)
+
+    def __run_station(self, station: Station):
+        set_station(station.name)
+        start_time = time.time()
+        station.status = "выполняется"
+        try:
+            exp_name = f"{station.name}/{station.dut}"
+            for experiment_name, variables in self.experiments:
+                generator = instruments.get(hardware.RigolDSG815, ip=station.generator_ip, level=-70, freq=1160,
+                                            reset=self.reset)
+                oscilloscope = instruments.get(hardware.AKIP4122, ip=station.oscilloscope_ip,
+                                               port=station.oscilloscope_port)
+                journal = Journal.create(exp_name, experiment_name, variables)
+                experiment = getattr(funcs, experiment_name)(*variables, oscilloscope, generator, exp_name,
+                                                             journal=journal, dut=station.dut, **self.options)
+                experiment.start()
+            station.status = "завершен"
+        except Exception:
+            logging.exception(f"Эксперимент на стенде {station.name} прерван")
+            station.status = "ошибка"
+        station.elapsed = time.time() - start_time
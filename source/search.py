@@ -0,0 +1,221 @@
+import logging
+import math
+
+
+class SearchStrategy:
+    """Базовый класс стратегии поиска оптимального уровня [Дб].
+
+    Напряжение детектора монотонно убывает с ростом уровня генератора,
+    поэтому ищется уровень, при котором напряжение ближе всего к target.
+    Уровни перебираются по сетке db_min + k * resolution, каждый уровень
+    измеряется не более одного раза.
+
+    При warm_start поиск начинается с подсказки hint (уровень соседней
+    частоты): от нее шаги 1, 2, 4... узла сетки в сторону пересечения target,
+    и только найденная вилка уточняется методом стратегии. Если до края
+    окна пересечения нет, поиск выполняется по всему окну.
+    Уровень seed (из кеша калибровки) задает начало поиска так же, но
+    и при выключенном warm_start.
+    """
+
+    name = None
+
+    def __init__(self, resolution: int | float = 1, target: float = 1.0, tolerance: float = 0.0,
+                 warm_start: bool = True):
+        self.resolution = resolution
+        self.target = target
+        self.tolerance = tolerance
+        self.warm_start = bool(warm_start)
+        self.probes = {}
+        self._probe = None
+        self._db_min = 0
+
+    def search(self, probe, db_min: int | float, db_max: int | float, hint: int | float | None = None,
+               seed: int | float | None = None):
+        """
+        Поиск оптимального уровня в окне [db_min, db_max].
+        probe(db) устанавливает уровень и возвращает (voltage, pkp),
+        hint - ожидаемый уровень (например, найденный на предыдущей частоте),
+        seed - уровень из кеша калибровки, используется вместо hint.
+        Возвращает кортеж (voltage, pkp, db)
+        """
+        self.probes = {}
+        self._probe = probe
+        self._db_min = db_min
+        high = self._last(db_max)
+        start = self._start(high, hint, seed)
+        if start is None:
+            self._find(0, high)
+        else:
+            self._find_from(start, high)
+        return self.best()
+
+    def start_level(self, db_min: int | float, db_max: int | float, hint: int | float | None = None,
+                    seed: int | float | None = None):
+        """Уровень, с которого search начнет измерения"""
+        self._db_min = db_min
+        return self._db(self._start(self._last(db_max), hint, seed) or 0)
+
+    def best(self):
+        """Измеренная точка с напряжением, ближайшим к target"""
+        db = min(self.probes, key=lambda x: abs(self.probes[x][0] - self.target))
+        voltage, pkp = self.probes[db]
+        return voltage, pkp, db
+
+    def _find(self, low: int, high: int):
+        raise NotImplementedError
+
+    def _find_from(self, start: int, high: int):
+        """Поиск вилки шагами 1, 2, 4... от узла start, затем уточнение _find"""
+        voltage = self._measure(start)
+        if self._converged(voltage):
+            return
+        # Напряжение убывает с ростом уровня: выше target - идти вверх по уровню
+        direction = 1 if voltage > self.target else -1
+        edge = high if direction == 1 else 0
+        near, step = start, 1
+        while near != edge:
+            far = min(near + step, high) if direction == 1 else max(near - step, 0)
+            voltage = self._measure(far)
+            if self._converged(voltage):
+                return
+            if voltage <= self.target if direction == 1 else voltage >= self.target:
+                self._find(min(near, far), max(near, far))
+                return
+            near, step = far, 2 * step
+        # Пересечения между подсказкой и краем окна нет
+        self._find(0, high)
+
+    def _last(self, db_max):
+        """Номер последнего узла сетки"""
+        return int(round((db_max - self._db_min) / self.resolution))
+
+    def _start(self, high: int, hint, seed=None):
+        """Узел сетки, ближайший к seed или подсказке, или None без них"""
+        if seed is None:
+            if not self.warm_start or hint is None:
+                return None
+            seed = hint
+        return min(max(int(round((seed - self._db_min) / self.resolution)), 0), high)
+
+    def _db(self, k: int):
+        db = round(self._db_min + k * self.resolution, 2)
+        return int(db) if float(db).is_integer() else db
+
+    def _measure(self, k: int):
+        """Напряжение в узле сетки k (с кешированием)"""
+        db = self._db(k)
+        if db not in self.probes:
+            self.probes[db] = self._probe(db)
+        return self.probes[db][0]
+
+    def _converged(self, voltage: float):
+        return abs(voltage - self.target) <= self.tolerance
+
+
+class LinearSearch(SearchStrategy):
+    """Линейный проход от минимального уровня до падения напряжения ниже threshold"""
+
+    name = "linear"
+
+    def __init__(self, resolution: int | float = 1, target: float = 1.0, tolerance: float = 0.0,
+                 warm_start: bool = True, threshold: float = 0.85):
+        super().__init__(resolution, target, tolerance, warm_start)
+        self.threshold = threshold
+
+    def _find(self, low, high):
+        for k in range(low, high + 1):
+            if self._measure(k) < self.threshold:
+                # Точка ниже порога в выбор не попадает, если есть из чего выбирать
+                if len(self.probes) > 1:
+                    del self.probes[self._db(k)]
+                return
+
+
+class BisectionSearch(SearchStrategy):
+    """Деление отрезка пополам по знаку (voltage - target)"""
+
+    name = "bisection"
+
+    def _find(self, low, high):
+        if self._measure(low) <= self.target or self._measure(high) >= self.target:
+            return
+        while high - low > 1:
+            middle = (low + high) // 2
+            voltage = self._measure(middle)
+            if self._converged(voltage):
+                return
+            if voltage > self.target:
+                low = middle
+            else:
+                high = middle
+
+
+class SecantSearch(SearchStrategy):
+    """Метод ложного положения (секущих) с модификацией Illinois"""
+
+    name = "secant"
+
+    def _find(self, low, high):
+        f_low = self._measure(low) - self.target
+        f_high = self._measure(high) - self.target
+        if f_low <= 0 or f_high >= 0:
+            return
+        side = 0
+        while high - low > 1:
+            k = low + int(round(f_low * (high - low) / (f_low - f_high)))
+            k = min(max(k, low + 1), high - 1)
+            f_k = self._measure(k) - self.target
+            if self._converged(f_k + self.target):
+                return
+            if f_k > 0:
+                low, f_low = k, f_k
+                if side == 1:
+                    f_high /= 2
+                side = 1
+            else:
+                high, f_high = k, f_k
+                if side == -1:
+                    f_low /= 2
+                side = -1
+
+
+class GoldenSectionSearch(SearchStrategy):
+    """Метод золотого сечения для минимума |voltage - target|"""
+
+    name = "golden"
+
+    INV_PHI = (math.sqrt(5) - 1) / 2
+
+    def _find(self, low, high):
+        while high - low > 2:
+            left = high - int(round((high - low) * self.INV_PHI))
+            right = low + int(round((high - low) * self.INV_PHI))
+            if left >= right:
+                left, right = (low + high) // 2, (low + high) // 2 + 1
+            f_left = abs(self._measure(left) - self.target)
+            f_right = abs(self._measure(right) - self.target)
+            if min(f_left, f_right) <= self.tolerance:
+                return
+            if f_left <= f_right:
+                high = right
+            else:
+                low = left
+        for k in range(low, high + 1):
+            self._measure(k)
+
+
+STRATEGIES = {cls.name: cls for cls in (LinearSearch, BisectionSearch, SecantSearch, GoldenSectionSearch)}
+
+
+def make_strategy(db_step: int | float, method: str = "linear", **params):
+    """
+    Создание стратегии поиска по параметрам секции [Search] config.ini.
+    Для линейного прохода шаг по умолчанию равен db_step эксперимента
+    """
+    if method not in STRATEGIES:
+        logging.error(f"Неизвестный метод поиска уровня: {method}")
+        raise ValueError(f"Неизвестный метод поиска уровня: {method}")
+    if method == LinearSearch.name:
+        params.setdefault("resolution", db_step)
+    return STRATEGIES[method](**params)
@@ -0,0 +1,103 @@
+import logging
+import math
+import statistics
+import time
+
+
+class SettlingDetector:
+    """
+    Ожидание установления показаний осциллографа после перестройки генератора.
+
+    После минимальной паузы min_wait осциллограф опрашивается каждые
+    poll_interval секунд, пока два подряд значения AVERage не совпадут
+    с точностью tolerance [В] или не истечет max_wait.
+    При min_wait == max_wait поведение совпадает с фиксированной паузой.
+    """
+
+    def __init__(self, osc, tolerance: float = 0.005, min_wait: float = 0.05, max_wait: float = 1.0,
+                 poll_interval: float = 0.05):
+        self.osc = osc
+        self.tolerance = tolerance
+        self.min_wait = min_wait
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        # Время установления каждого измерения [с]
+        self.history = []
+
+    def wait(self):
+        """
+        Дождаться установления и вернуть (data, settle_time),
+        где data - последний ответ osc.get_all()
+        """
+        start_time = time.perf_counter()
+        time.sleep(self.min_wait)
+        data = self.osc.get_all()
+        voltage_last = self.osc.convert_voltage(data["AVERage"])
+
+        while time.perf_counter() - start_time + self.poll_interval <= self.max_wait:
+            time.sleep(self.poll_interval)
+            data = self.osc.get_all()
+            voltage_current = self.osc.convert_voltage(data["AVERage"])
+            if abs(voltage_current - voltage_last) <= self.tolerance:
+                break
+            voltage_last = voltage_current
+        else:
+            if self.max_wait > self.min_wait:
+                logging.debug(f"Показания не установились за {self.max_wait}с")
+
+        settle_time = time.perf_counter() - start_time
+        self.history.append(settle_time)
+        return data, settle_time
+
+
+class RepeatedReading:
+    """
+    Повторные чтения осциллографа на одной точке с ранней остановкой.
+
+    Среднее и дисперсия AVERage накапливаются по Уэлфорду; чтения
+    прекращаются, как только полуширина доверительного интервала среднего
+    (уровень confidence) не больше interval [В], или после max_samples чтений.
+    Пока чтений меньше min_samples, СКО одного чтения оценивается сверху
+    по PKPK / 6, поэтому на тихой точке достаточно одного чтения.
+    При max_samples = 1 всегда выполняется одно чтение.
+    Между чтениями выдерживается sample_interval [с]: AVERage осциллографа
+    обновляется только с новой осциллограммой, и чтения подряд без паузы
+    возвращают одно и то же значение
+    """
+
+    def __init__(self, osc, interval: float = 0.005, confidence: float = 0.95, max_samples: int = 8,
+                 min_samples: int = 3, sample_interval: float = 0.05):
+        if not 0 < confidence < 1:
+            logging.error(f"Доверительная вероятность должна быть от 0 до 1: {confidence}")
+            raise ValueError(f"Доверительная вероятность должна быть от 0 до 1: {confidence}")
+        self.osc = osc
+        self.interval = interval
+        self.z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+        self.max_samples = max(int(max_samples), 1)
+        self.min_samples = max(int(min_samples), 2)
+        self.sample_interval = sample_interval
+        # Число чтений на каждой точке
+        self.history = []
+
+    def measure(self, data):
+        """
+        Среднее напряжение и PKPK [В] по чтениям, начиная с уже полученного
+        ответа data осциллографа (osc.get_all())
+        """
+        count, mean, m2, pkp_total = 0, 0.0, 0.0, 0.0
+        while True:
+            voltage = self.osc.convert_voltage(data["AVERage"])
+            pkp_total += self.osc.convert_voltage(data["PKPK"])
+            count += 1
+            delta = voltage - mean
+            mean += delta / count
+            m2 += delta * (voltage - mean)
+            if count >= self.max_samples:
+                break
+            sigma = math.sqrt(m2 / (count - 1)) if count >= self.min_samples else pkp_total / count / 6
+            if self.z * sigma / math.sqrt(count) <= self.interval:
+                break
+            time.sleep(self.sample_interval)
+            data = self.osc.get_all()
+        self.history.append(count)
+        return mean, pkp_total / count
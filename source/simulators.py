@@ -0,0 +1,468 @@
+"""
+Имитаторы приборов стенда для отладки и измерения производительности без оборудования.
+
+Vxi11GeneratorSimulator отвечает по VXI-11 (ONC RPC) так же, как Rigol DSG815,
+и подключается через pyvisa: TCPIP0::<host>,<port>::INSTR (без portmapper) или
+TCPIP0::<host>::INSTR, если запущен portmapper на порту 111.
+AkipOscilloscopeSimulator отвечает на текстовые команды по TCP (порт 3000 у AKIP-4122).
+Оба имитатора используют общую модель стенда BenchModel.
+Имитатор генератора поддерживает list-свип (таблица :SWE:LIST:INS, переход
+по точкам по времени точки или по *TRG); время точки отсчитывается в реальном
+времени, без ускорения speed.
+
+Запуск из корня репозитория:
+    python -m source.simulators
+"""
+import json
+import logging
+import math
+import re
+import socketserver
+import struct
+import threading
+import time
+
+import numpy as np
+from pyvisa_py.protocols import rpc, vxi11
+
+
+def detector_voltage(level, freq, center_freq=1160):
+    """Установившееся напряжение детектора РЭМ [В] при уровне level [Дб] и частоте freq [Мгц]"""
+    offset = abs(freq - center_freq)
+    knee = -55 + 10 * offset / 6 if offset <= 6 else -45 + 40 * min((offset - 6) / 2, 1)
+    return 0.1 + 1.9 / (1 + math.exp((level - knee) / 6))
+
+
+class BenchModel:
+    """
+    Модель стенда генератор -> РЭМ -> осциллограф.
+
+    После перестройки генератора напряжение экспоненциально приближается
+    к установившемуся значению transfer(level, freq) с постоянной времени
+    tau, которая возрастает до tau + tau_center вблизи центральной частоты.
+    К измерению добавляется гауссов шум noise [В], у центральной частоты -
+    до noise + noise_center. speed > 1 ускоряет
+    динамику модели (и задержки имитаторов) относительно реального времени
+    """
+
+    NO_SIGNAL_LEVEL = -200
+
+    def __init__(self, center_freq=1160, tau=0.02, tau_center=0.15, center_width=2, noise=0.002, speed=1,
+                 seed=0, transfer=detector_voltage, noise_center=0):
+        self.center_freq = center_freq
+        self.tau = tau
+        self.tau_center = tau_center
+        self.center_width = center_width
+        self.noise = noise
+        self.noise_center = noise_center
+        self.speed = speed
+        self.transfer = transfer
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+
+        self.level = -110
+        self.freq = center_freq
+        self.output = False
+        self.__changed = self.clock()
+        self.__start_voltage = self.target()
+
+    def clock(self):
+        """Время модели [с]"""
+        return time.monotonic() * self.speed
+
+    def target(self):
+        """Установившееся напряжение при текущем состоянии генератора"""
+        level = self.level if self.output else self.NO_SIGNAL_LEVEL
+        return self.transfer(level, self.freq, self.center_freq)
+
+    def time_constant(self):
+        return self.tau + self.tau_center * self.__near_center()
+
+    def noise_level(self):
+        """СКО шума осциллографа [В] на текущей частоте"""
+        return self.noise + self.noise_center * self.__near_center()
+
+    def set_state(self, level=None, freq=None, output=None):
+        """Перестройка генератора"""
+        with self.lock:
+            voltage = self.__voltage()
+            if level is not None:
+                self.level = level
+            if freq is not None:
+                self.freq = freq
+            if output is not None:
+                self.output = output
+            self.__start_voltage = voltage
+            self.__changed = self.clock()
+
+    def measure(self):
+        """Измерение осциллографа: (среднее, размах) [В]"""
+        with self.lock:
+            noise = self.noise_level()
+            voltage = self.__voltage() + self.rng.normal(0, noise)
+            pkp = 6 * noise * (1 + 0.2 * self.rng.random())
+        return voltage, pkp
+
+    def __near_center(self):
+        """От 1 на центральной частоте до 0 вдали от нее"""
+        return math.exp(-((self.freq - self.center_freq) / self.center_width) ** 2)
+
+    def __voltage(self):
+        target = self.target()
+        elapsed = self.clock() - self.__changed
+        return target + (self.__start_voltage - target) * math.exp(-elapsed / self.time_constant())
+
+
+def format_voltage(voltage):
+    """Напряжение в формате AKIP-4122"""
+    return f"{voltage * 1000:.2f}mV" if abs(voltage) < 1 else f"{voltage:.4f}V"
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _SimulatorBase:
+    """Общая часть имитаторов: TCP-сервер в фоновом потоке"""
+
+    def __init__(self, model: BenchModel, host: str, port: int, latency: float, handler):
+        self.model = model
+        self.latency = latency
+        self.server = _ThreadingServer((host, port), handler)
+        self.server.simulator = self
+        self.host, self.port = self.server.server_address[:2]
+        self.__thread = None
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.server.serve_forever, name=type(self).__name__, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def delay(self):
+        """Задержка ответа прибора"""
+        if self.latency:
+            time.sleep(self.latency / self.model.speed)
+
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+
+def _recv_record(sock):
+    """Запись ONC RPC (record marking), None - соединение закрыто"""
+    record = bytearray()
+    while True:
+        header = _recv_exact(sock, 4)
+        if header is None:
+            return None
+        (marker,) = struct.unpack(">I", header)
+        fragment = _recv_exact(sock, marker & 0x7FFFFFFF)
+        if fragment is None:
+            return None
+        record += fragment
+        if marker & 0x80000000:
+            return bytes(record)
+
+
+class _RpcHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            call = _recv_record(self.request)
+            if call is None:
+                return
+            unpacker = rpc.Unpacker(call)
+            xid, prog, vers, proc, _, _ = unpacker.unpack_callheader()
+            packer = rpc.Packer()
+            packer.pack_uint(xid)
+            packer.pack_enum(rpc.MessagegType.reply)
+            packer.pack_uint(rpc.ReplyStatus.accepted)
+            packer.pack_auth((rpc.AuthorizationFlavor.null, rpc.make_auth_null()))
+            method = self.server.procedures.get((prog, vers, proc))
+            if method is None:
+                packer.pack_enum(rpc.AcceptStatus.procedure_unavailable)
+            else:
+                packer.pack_enum(rpc.AcceptStatus.success)
+                method(unpacker, packer)
+            rpc._sendrecord(self.request, packer.get_buf())
+
+
+class Vxi11GeneratorSimulator(_SimulatorBase):
+    """Имитатор генератора Rigol DSG815 по VXI-11"""
+
+    IDN = "Rigol Technologies,DSG815,DSG8SIM00001,00.01.03"
+
+    def __init__(self, model: BenchModel, host: str = "127.0.0.1", port: int = 0, latency: float = 0.002,
+                 portmapper_port: int | None = None):
+        super().__init__(model, host, port, latency, _RpcHandler)
+        core = vxi11.DEVICE_CORE_PROG, vxi11.DEVICE_CORE_VERS
+        self.server.procedures = {
+            core + (0,): lambda unpacker, packer: None,
+            core + (vxi11.CREATE_LINK,): self.__create_link,
+            core + (vxi11.DEVICE_WRITE,): self.__device_write,
+            core + (vxi11.DEVICE_READ,): self.__device_read,
+            core + (vxi11.DEVICE_CLEAR,): self.__device_generic,
+            core + (vxi11.DEVICE_REMOTE,): self.__device_generic,
+            core + (vxi11.DEVICE_LOCAL,): self.__device_generic,
+            core + (vxi11.DESTROY_LINK,): self.__destroy_link,
+        }
+        self.replies = {}
+        self.__links = 0
+        self.__lock = threading.Lock()
+        # Таблица свипа: (частота [Мгц], уровень [Дб], время точки [с])
+        self.sweep_list = []
+        self.sweep_trigger = "AUTO"
+        self.__sweep_point = None
+        self.__sweep_stop = threading.Event()
+
+        self.portmapper = None
+        if portmapper_port is not None:
+            self.portmapper = _ThreadingServer((host, portmapper_port), _RpcHandler)
+            self.portmapper.procedures = {
+                (rpc.PMAP_PROG, rpc.PMAP_VERS, rpc.PortMapperVersion.null): lambda unpacker, packer: None,
+                (rpc.PMAP_PROG, rpc.PMAP_VERS, rpc.PortMapperVersion.get_port): self.__get_port,
+            }
+
+    def start(self):
+        if self.portmapper is not None:
+            threading.Thread(target=self.portmapper.serve_forever, name="PortMapper", daemon=True).start()
+        return super().start()
+
+    def stop(self):
+        if self.portmapper is not None:
+            self.portmapper.shutdown()
+            self.portmapper.server_close()
+        super().stop()
+
+    def execute(self, message: str):
+        """Выполнение сообщения SCPI (команды через ";"), ответ на запросы или None"""
+        replies = []
+        for command in filter(None, (part.strip() for part in message.split(";"))):
+            reply = self.command(command)
+            if reply is not None:
+                replies.append(reply)
+        return ";".join(replies) if replies else None
+
+    def command(self, command: str):
+        header, _, argument = command.partition(" ")
+        header = header.upper().lstrip(":")
+        if header == "*IDN?":
+            return self.IDN
+        if header == "*TRG":
+            self.__sweep_next()
+        elif header.startswith("SWE"):
+            self.sweep_command(header, argument)
+        elif header.startswith("LEV"):
+            if header.endswith("?"):
+                return f"{self.model.level}"
+            self.model.set_state(level=float(argument))
+        elif header.startswith("FREQ"):
+            if header.endswith("?"):
+                return f"{self.model.freq * 1e6:.0f}"
+            self.model.set_state(freq=self.parse_freq(argument))
+        elif header.startswith("OUTP"):
+            if header.endswith("?"):
+                return "1" if self.model.output else "0"
+            self.model.set_state(output=argument.strip().upper() in ("ON", "1"))
+        elif header.startswith("SYST:PRES"):
+            self.model.set_state(level=-110, freq=self.model.center_freq, output=False)
+        else:
+            logging.debug(f"Имитатор генератора: неизвестная команда {command}")
+        return None
+
+    def sweep_command(self, header: str, argument: str):
+        """Команды list-свипа"""
+        if header.startswith("SWE:LIST:DEL"):
+            self.sweep_list = []
+        elif header.startswith("SWE:LIST:INS"):
+            freq, level, dwell = argument.split(",")
+            self.sweep_list.append((self.parse_freq(freq), float(level), float(dwell)))
+        elif header.startswith("SWE:POIN:TRIG:TYPE"):
+            self.sweep_trigger = argument.strip().upper()
+        elif header.startswith("SWE:STAT"):
+            if argument.strip().upper() == "OFF":
+                self.__sweep_stop.set()
+                self.__sweep_point = None
+        elif header.startswith("SWE:EXEC"):
+            self.__sweep_start()
+
+    def __sweep_start(self):
+        self.__sweep_stop.set()
+        if not self.sweep_list:
+            return
+        self.__sweep_stop = threading.Event()
+        self.__sweep_point = -1
+        self.__sweep_next()
+        if self.sweep_trigger != "BUS":
+            threading.Thread(target=self.__sweep_dwell, args=(list(self.sweep_list), self.__sweep_stop),
+                             name="SweepSimulator", daemon=True).start()
+
+    def __sweep_next(self):
+        """Переход к следующей точке таблицы свипа"""
+        if self.__sweep_point is None or self.__sweep_point + 1 >= len(self.sweep_list):
+            return
+        self.__sweep_point += 1
+        freq, level, _ = self.sweep_list[self.__sweep_point]
+        self.model.set_state(level=level, freq=freq)
+
+    def __sweep_dwell(self, sweep_list, stop):
+        """Переход по точкам по истечении времени точки"""
+        deadline = time.monotonic()
+        for _, _, dwell in sweep_list[:-1]:
+            deadline += dwell
+            if stop.wait(max(deadline - time.monotonic(), 0)):
+                return
+            self.__sweep_next()
+
+    @staticmethod
+    def parse_freq(argument: str):
+        """Частота SCPI с единицами (Hz, kHz, MHz, GHz) в Мгц"""
+        match = re.fullmatch(r"\s*([-+0-9.eE]+)\s*([a-zA-Z]*)\s*", argument)
+        value, unit = float(match.group(1)), match.group(2).upper()
+        return value * {"": 1e-6, "HZ": 1e-6, "KHZ": 1e-3, "MHZ": 1, "GHZ": 1e3}[unit]
+
+    def __create_link(self, unpacker, packer):
+        unpacker.unpack_int()
+        unpacker.unpack_bool()
+        unpacker.unpack_uint()
+        unpacker.unpack_string()
+        with self.__lock:
+            self.__links += 1
+            link = self.__links
+        self.replies[link] = b""
+        packer.pack_int(vxi11.ErrorCodes.no_error)
+        packer.pack_int(link)
+        packer.pack_uint(0)
+        packer.pack_uint(1024 * 1024)
+
+    def __device_write(self, unpacker, packer):
+        link = unpacker.unpack_int()
+        unpacker.unpack_uint()
+        unpacker.unpack_uint()
+        unpacker.unpack_int()
+        data = unpacker.unpack_opaque()
+        self.delay()
+        reply = self.execute(data.decode("ascii", errors="replace"))
+        if reply is not None:
+            self.replies[link] = f"{reply}\n".encode()
+        packer.pack_int(vxi11.ErrorCodes.no_error)
+        packer.pack_uint(len(data))
+
+    def __device_read(self, unpacker, packer):
+        link = unpacker.unpack_int()
+        request_size = unpacker.unpack_uint()
+        for _ in range(4):
+            unpacker.unpack_int()
+        self.delay()
+        data = self.replies.get(link, b"")
+        if not data:
+            packer.pack_int(vxi11.ErrorCodes.io_timeout)
+            packer.pack_int(0)
+            packer.pack_opaque(b"")
+            return
+        chunk, self.replies[link] = data[:request_size], data[request_size:]
+        packer.pack_int(vxi11.ErrorCodes.no_error)
+        packer.pack_int(vxi11.RX_END if not self.replies[link] else vxi11.RX_REQCNT)
+        packer.pack_opaque(chunk)
+
+    def __device_generic(self, unpacker, packer):
+        packer.pack_int(vxi11.ErrorCodes.no_error)
+
+    def __destroy_link(self, unpacker, packer):
+        self.replies.pop(unpacker.unpack_int(), None)
+        packer.pack_int(vxi11.ErrorCodes.no_error)
+
+    def __get_port(self, unpacker, packer):
+        prog, vers, _, _ = unpacker.unpack_uint(), unpacker.unpack_uint(), unpacker.unpack_uint(), unpacker.unpack_uint()
+        core = (prog, vers) == (vxi11.DEVICE_CORE_PROG, vxi11.DEVICE_CORE_VERS)
+        packer.pack_uint(self.port if core else 0)
+
+
+class _LineHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            reply = self.server.simulator.execute(line.decode("latin1").strip())
+            if reply is not None:
+                self.wfile.write(reply.encode("latin1"))
+
+
+class AkipOscilloscopeSimulator(_SimulatorBase):
+    """Имитатор осциллографа AKIP-4122 (текстовые команды по TCP)"""
+
+    IDN = "AKIP,AKIP-4122,SIM00001,1.0.0"
+
+    def __init__(self, model: BenchModel, host: str = "127.0.0.1", port: int = 0, latency: float = 0.005):
+        super().__init__(model, host, port, latency, _LineHandler)
+
+    def execute(self, command: str):
+        command = command.upper()
+        if not command:
+            return None
+        self.delay()
+        if command == "*IDN?":
+            return f"{self.IDN}\n"
+        if command == ":MEASUREMENT:CH1?":
+            voltage, pkp = self.model.measure()
+            values = {"AVERage": format_voltage(voltage),
+                      "PKPK": format_voltage(pkp),
+                      "MAX": format_voltage(voltage + pkp / 2),
+                      "MIN": format_voltage(voltage - pkp / 2)}
+            return json.dumps({"CH1": values}) + "\n"
+        if command == ":MEASUREMENT:CH1:AVERAGE?":
+            return f"AVG:{format_voltage(self.model.measure()[0])};\r\n"
+        if command == ":MEASUREMENT:CH1:PKPK?":
+            return f"PKPK: {format_voltage(self.model.measure()[1])};\r\n"
+        if command in ("*RST", "*CLS"):
+            return None
+        logging.debug(f"Имитатор осциллографа: неизвестная команда {command}")
+        return None
+
+
+class BenchSimulator:
+    """Имитатор стенда: генератор и осциллограф с общей моделью"""
+
+    def __init__(self, host: str = "127.0.0.1", generator_port: int = 0, oscilloscope_port: int = 0,
+                 portmapper_port: int | None = None, generator_latency: float = 0.002,
+                 oscilloscope_latency: float = 0.005, **model):
+        self.host = host
+        self.model = BenchModel(**model)
+        self.generator = Vxi11GeneratorSimulator(self.model, host, generator_port, generator_latency,
+                                                 portmapper_port)
+        self.oscilloscope = AkipOscilloscopeSimulator(self.model, host, oscilloscope_port, oscilloscope_latency)
+
+    def start(self):
+        self.generator.start()
+        self.oscilloscope.start()
+        logging.info(f"Имитатор генератора: TCPIP0::{self.host},{self.generator.port}::INSTR, "
+                     f"имитатор осциллографа: {self.host}:{self.oscilloscope.port}")
+        return self
+
+    def stop(self):
+        self.generator.stop()
+        self.oscilloscope.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    with BenchSimulator(generator_port=5555, oscilloscope_port=3000):
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
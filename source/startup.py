@@ -0,0 +1,39 @@
+"""
+Профиль запуска программы: время импорта модулей по данным python -X importtime.
+
+    python main.py --profile-startup
+"""
+import os
+import subprocess
+import sys
+
+# Код, выполняемый до первого вопроса оператору, и полный набор модулей эксперимента
+STAGES = (("До ввода параметров РЭМа", "import main"),
+          ("Модули экспериментов и приборов (в фоне)", "import main; main.load_experiment_modules()"))
+
+
+def import_times(code: str):
+    """Время импорта модулей при выполнении code: {модуль: (собственное, суммарное) [мс]}"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, cwd=root)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(own) / 1000, int(cumulative) / 1000)
+    return times
+
+
+def report_startup(top: int = 15):
+    """Вывести самые долгие импорты для каждого этапа запуска"""
+    seen = set()
+    for title, code in STAGES:
+        times = {name: value for name, value in import_times(code).items() if name not in seen}
+        seen.update(times)
+        total = sum(own for own, _ in times.values())
+        print(f"\n{title}: {len(times)} модулей, {total:.0f} мс")
+        print(f"{'Модуль':<50}{'собств., мс':>12}{'всего, мс':>12}")
+        for name, (own, cumulative) in sorted(times.items(), key=lambda item: -item[1][1])[:top]:
+            print(f"{name:<50}{own:>12.1f}{cumulative:>12.1f}")
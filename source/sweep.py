@@ -0,0 +1,117 @@
+import logging
+import time
+
+import numpy as np
+
+
+class ListSweep:
+    """
+    Измерение набора частот list-свипом генератора.
+
+    Таблица частот и уровней загружается в генератор одним сообщением,
+    дальше генератор переходит по точкам сам: по истечении dwell [с]
+    (trigger="dwell") или по команде *TRG (trigger="bus").
+    В режиме dwell хост не обращается к генератору на каждой точке:
+    осциллограф опрашивается по расписанию через read_delay [с] после начала
+    точки. Если опрос не уложился в окно точки, свип останавливается, точка
+    измеряется обычной перестройкой с ожиданием установления, и свип
+    продолжается с оставшихся точек. После max_misses таких опросов подряд
+    оставшиеся точки измеряются поточечно, без повторной загрузки таблицы.
+    В режиме bus после *TRG используется обычное ожидание установления.
+    Повторные чтения reading (RepeatedReading) в режиме dwell тоже должны
+    уложиться в окно точки.
+    Таблица длиннее max_points загружается частями
+    """
+
+    TRIGGERS = ("dwell", "bus")
+
+    def __init__(self, gen, osc, settling, reading, trigger: str = "dwell", dwell: float = 0.3,
+                 read_delay: float = 0.2, max_points: int = 1000, max_misses: int = 3):
+        if trigger not in self.TRIGGERS:
+            logging.error(f"Неизвестный способ перехода по точкам свипа: {trigger}")
+            raise ValueError(f"Неизвестный способ перехода по точкам свипа: {trigger}")
+        if trigger == "dwell" and not 0 <= read_delay < dwell:
+            logging.error("Задержка чтения осциллографа должна быть меньше времени точки свипа")
+            raise ValueError("Задержка чтения осциллографа должна быть меньше времени точки свипа")
+        self.gen = gen
+        self.osc = osc
+        self.settling = settling
+        self.reading = reading
+        self.trigger = trigger
+        self.dwell = dwell
+        self.read_delay = read_delay
+        self.max_points = int(max_points)
+        self.max_misses = max(int(max_misses), 1)
+        # Точки, опрос которых не уложился в окно свипа, и такие опросы подряд
+        self.late = 0
+        self.misses = 0
+
+    def readings(self, freqs, levels):
+        """
+        Генератор измерений (voltage, pkp, settle_time) по точкам freqs [Мгц]
+        с уровнями levels [Дб] (число или массив той же длины), в порядке точек
+        """
+        freqs = np.asarray(freqs, dtype=float)
+        levels = np.broadcast_to(np.asarray(levels, dtype=float), freqs.shape)
+        start = 0
+        while start < len(freqs) and self.misses < self.max_misses:
+            stop = min(start + self.max_points, len(freqs))
+            start += yield from self.__segment(freqs[start:stop], levels[start:stop])
+        if self.late:
+            logging.warning(f"Свип: {self.late} точек измерено поточечно из-за задержки опроса осциллографа")
+        if start < len(freqs):
+            logging.warning(f"Свип: {self.misses} опросов подряд не уложились в {self.dwell}с, "
+                            f"оставшиеся {len(freqs) - start} точек измеряются поточечно")
+            for freq, level in zip(freqs[start:], levels[start:]):
+                self.gen.configure(freq=freq, level=level)
+                yield self.__settled()
+
+    def __segment(self, freqs, levels):
+        """Свип по части таблицы, возвращает число измеренных точек"""
+        self.gen.load_sweep(freqs, levels, self.dwell, self.trigger)
+        late = None
+        before = time.perf_counter()
+        self.gen.start_sweep()
+        after = time.perf_counter()
+        try:
+            for k in range(len(freqs)):
+                if self.trigger == "bus":
+                    if k:
+                        self.gen.trigger()
+                    yield self.__settled()
+                    continue
+
+                # Точка k началась не раньше after + k * dwell и закончится не позже before + (k + 1) * dwell
+                step = after + k * self.dwell
+                self.__sleep_until(step + self.read_delay)
+                read_time = time.perf_counter()
+                voltage, pkp = self.reading.measure(self.osc.get_all())
+                if time.perf_counter() > before + (k + 1) * self.dwell:
+                    late = k
+                    break
+                self.misses = 0
+                settle_time = read_time - step
+                self.settling.history.append(settle_time)
+                yield voltage, pkp, settle_time
+        finally:
+            self.gen.stop_sweep()
+
+        if late is None:
+            return len(freqs)
+        self.late += 1
+        self.misses += 1
+        logging.debug(f"Свип: опрос на {freqs[late]}Мгц не уложился в {self.dwell}с, точка измеряется поточечно")
+        self.gen.configure(freq=freqs[late], level=levels[late])
+        yield self.__settled()
+        return late + 1
+
+    def __settled(self):
+        """Измерение после ожидания установления"""
+        data, settle_time = self.settling.wait()
+        return *self.reading.measure(data), settle_time
+
+    @staticmethod
+    def __sleep_until(deadline: float):
+        delay = deadline - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)